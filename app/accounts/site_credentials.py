@@ -1,6 +1,6 @@
 from urllib.parse import urlparse
-from typing import Optional
-from ..db import get_session, SiteCredential
+from typing import Optional, Dict
+from ..db import site_credential_find_by_domain
 from ..security.crypto import decrypt_str
 
 def normalize_domain(site_url: str) -> str:
@@ -9,12 +9,9 @@ def normalize_domain(site_url: str) -> str:
     parsed = urlparse(site_url)
     return parsed.netloc.lower()
 
-def fetch_site_credential_for_url(media_url: str) -> Optional[SiteCredential]:
+def fetch_site_credential_for_url(media_url: str) -> Optional[Dict]:
     domain = normalize_domain(media_url)
-    session = get_session()
-    cred = session.query(SiteCredential).filter_by(domain=domain).first()
-    session.close()
-    return cred
+    return site_credential_find_by_domain(domain)
 
-def get_plain_password(site_cred: SiteCredential) -> str:
-    return decrypt_str(site_cred.password_enc)
+def get_plain_password(site_cred: Dict) -> str:
+    return decrypt_str(site_cred["password_enc"])
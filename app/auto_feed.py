@@ -1,33 +1,156 @@
-import asyncio, logging
-from .db import get_session, Episode
+import asyncio, inspect, logging, random, time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+from .db import episode_find_one, episode_insert, feed_state_find_one, feed_state_update
 from .config import settings
 
 logger = logging.getLogger("auto_feed")
 
-async def poll_feed(fetch_function):
-    items = await fetch_function()
-    session = get_session()
+@dataclass
+class FeedResult:
+    items: List[Dict] = field(default_factory=list)
+    # Fetcher-owned state (etag, last_modified, cursor, ...) persisted between polls; None = unchanged
+    state: Optional[Dict] = None
+    not_modified: bool = False
+
+@dataclass
+class Feed:
+    name: str
+    fetch: Callable[[Dict], Awaitable[FeedResult]]
+    min_interval_min: float
+    max_interval_min: float
+
+_feeds: Dict[str, Feed] = {}
+_feed_docs: Dict[str, Dict] = {}  # Latest persisted state per feed, kept in step by poll_feed for /status
+_feed_tasks: Dict[str, asyncio.Task] = {}
+_poll_slots: Optional[asyncio.Semaphore] = None  # set once scheduler_loop has started
+
+def register_feed(name: str, fetch_function, min_interval_min: float = None, max_interval_min: float = None):
+    """
+    Register a feed for the scheduler. `fetch_function(state)` receives the
+    state it returned last time and returns a FeedResult. A zero-argument
+    fetch_function returning a list of items is also accepted. Feeds may be
+    registered before or after the scheduler starts.
+    """
+    if not inspect.signature(fetch_function).parameters:
+        legacy = fetch_function
+        async def fetch_function(state):
+            return FeedResult(items=await legacy())
+    _feeds[name] = Feed(
+        name=name,
+        fetch=fetch_function,
+        min_interval_min=min_interval_min or settings.AUTO_POLL_MIN_INTERVAL_MIN,
+        max_interval_min=max_interval_min or settings.AUTO_POLL_MAX_INTERVAL_MIN,
+    )
+    if _poll_slots is not None:
+        _start_feed_loop(name)
+
+async def conditional_get(client, url: str, state: Dict, **kwargs):
+    """
+    GET `url` with If-None-Match / If-Modified-Since from `state`. Returns None
+    on 304 Not Modified, otherwise the response, after storing the new
+    validators back into `state`.
+    """
+    headers = dict(kwargs.pop("headers", None) or {})
+    if state.get("etag"):
+        headers["If-None-Match"] = state["etag"]
+    if state.get("last_modified"):
+        headers["If-Modified-Since"] = state["last_modified"]
+    r = await client.get(url, headers=headers, **kwargs)
+    if r.status_code == 304:
+        return None
+    r.raise_for_status()
+    if r.headers.get("etag"):
+        state["etag"] = r.headers["etag"]
+    if r.headers.get("last-modified"):
+        state["last_modified"] = r.headers["last-modified"]
+    return r
+
+def _insert_new_items(items: List[Dict]) -> int:
+    added = 0
     for item in items:
-        existing = session.query(Episode).filter_by(
-            series_id=item["series_id"],
-            episode_number=item["episode_number"]
-        ).first()
+        existing = episode_find_one(item["series_id"], item["episode_number"])
         if existing:
             continue
-        ep = Episode(
+        episode_insert(
             series_id=item["series_id"],
             episode_number=item["episode_number"],
             source_url=item["source_url"],
             processed=False
         )
-        session.add(ep)
-    session.commit()
-    session.close()
+        added += 1
+    return added
 
-async def scheduler_loop(fetch_function, interval_min: int):
+def next_interval(feed: Feed, current_min: float, added: int) -> float:
+    """Poll twice as often after finding new episodes; back off 1.5x after an empty poll."""
+    if added:
+        interval = current_min / 2
+    else:
+        interval = current_min * 1.5
+    return min(feed.max_interval_min, max(feed.min_interval_min, interval))
+
+def _jittered(seconds: float) -> float:
+    j = settings.AUTO_POLL_JITTER
+    return seconds * random.uniform(1 - j, 1 + j)
+
+async def poll_feed(feed: Feed, doc: Dict) -> int:
+    state = dict(doc.get("state") or {})
+    result = await feed.fetch(state)
+    added = 0 if result.not_modified else _insert_new_items(result.items)
+    interval = next_interval(feed, doc.get("interval_min") or settings.AUTO_POLL_INTERVAL_MIN, added)
+    fields = {
+        "state": result.state if result.state is not None else state,
+        "interval_min": interval,
+        "last_polled_at": time.time(),
+        "last_added": added,
+    }
+    if added:
+        fields["last_new_at"] = time.time()
+    feed_state_update(feed.name, fields)
+    doc.update(fields)
+    return added
+
+async def _feed_loop(name: str, slots: asyncio.Semaphore):
+    doc = feed_state_find_one(name) or {}
+    _feed_docs[name] = doc
+    interval = doc.get("interval_min") or settings.AUTO_POLL_INTERVAL_MIN
+    # Resume the previous schedule; spread first polls so feeds don't all fire at startup
+    due_in = (doc.get("last_polled_at") or 0) + interval * 60 - time.time()
+    await asyncio.sleep(max(due_in, 0) + random.uniform(0, settings.AUTO_POLL_JITTER * interval * 60))
     while settings.ENABLE_AUTO_SCHEDULER:
+        # Looked up each round so re-registering a feed takes effect on its next poll
+        feed = _feeds[name]
         try:
-            await poll_feed(fetch_function)
+            async with slots:
+                added = await poll_feed(feed, doc)
+            if added:
+                logger.info("Feed %s: %s new episodes", feed.name, added)
         except Exception as e:
-            logger.error("Feed polling error: %s", e)
-        await asyncio.sleep(interval_min * 60)
+            logger.error("Feed polling error (%s): %s", feed.name, e)
+        await asyncio.sleep(_jittered((doc.get("interval_min") or settings.AUTO_POLL_INTERVAL_MIN) * 60))
+
+def _start_feed_loop(name: str):
+    task = _feed_tasks.get(name)
+    if task is None or task.done():
+        _feed_tasks[name] = asyncio.create_task(_feed_loop(name, _poll_slots))
+
+async def scheduler_loop():
+    """
+    Poll every registered feed on its own adaptive schedule, at most
+    AUTO_FEED_MAX_CONCURRENT at once. Feeds registered later start polling
+    as soon as they are registered.
+    """
+    global _poll_slots
+    _poll_slots = asyncio.Semaphore(settings.AUTO_FEED_MAX_CONCURRENT)
+    if not _feeds:
+        logger.info("No feeds registered yet; waiting for register_feed().")
+    for name in list(_feeds):
+        _start_feed_loop(name)
+
+def feed_status_lines() -> List[str]:
+    lines = []
+    for name in sorted(_feeds):
+        doc = _feed_docs.get(name) or {}
+        interval = doc.get("interval_min")
+        lines.append(f"{name}: every {interval:.0f} min, last added {doc.get('last_added', 0)}" if interval else f"{name}: not polled yet")
+    return lines
@@ -1,16 +1,28 @@
-import asyncio, logging
-from pyrogram import Client, filters
-from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+import asyncio, logging, os, shutil
+from typing import Optional
+from pyrogram import Client, filters, idle
 from .config import settings
-from .db import init_db, get_session, Episode, Job, Account, SiteCredential, YtDlpAllowedDomain
-from .storage.base import build_backends
-from .shorteners.base import shorten_url
-from .media.ffmpeg_wrapper import apply_watermark_and_metadata, build_all_variants
-from .naming import build_filename
-from .security.crypto import encrypt_str
+from .db import (
+    init_db, episode_find_one, episode_insert, episode_update, episode_find_all,
+    job_insert, storage_profile_find_one, channel_config_insert_or_update, channel_config_find_one,
+    channel_config_find_all, ytdlp_allow_domain, ytdlp_disallow_domain, ytdlp_is_allowed, ytdlp_list_domains,
+)
+from .storage.base import build_backends, route_backend
+from .media.ffmpeg_wrapper import apply_watermark_and_metadata, transcode_variant
+from .checkpoints import EpisodeCheckpoint, rendition_params
+from .naming import build_filename, sanitize_filename
 from .accounts.site_credentials import normalize_domain, fetch_site_credential_for_url, get_plain_password
-from .sites.registry import init_registry, find_adapter_for_domain
-from .sites.ytdlp_runner import download_with_ytdlp
+from .sites.registry import find_adapter_for_domain
+from .sites.ytdlp_pool import YtDlpPool, YtDlpCancelled, format_progress
+from .sites.domain_guard import DomainGuard, CircuitOpenError
+from .publishing import (
+    PROFILE_FIELDS, channel_profiles_for_episode, required_renditions, select_links, build_post,
+    parse_profile_args, telegram_file_id,
+)
+from .send_scheduler import SendScheduler, PRIORITY_REPLY, PRIORITY_PUBLISH
+from .auto_feed import scheduler_loop, feed_status_lines
+from .status_counters import set_state, begin_run, end_run, pending_count, format_status, reconcile, reconcile_loop
+from .startup_profile import lazy_import, timed, startup_report, since_process_start
 
 logger = logging.getLogger("bot")
 
@@ -23,9 +35,39 @@ app = Client(
 
 storage_backends = {}
 
+# All outbound Bot API calls go through this so bursts stay under Telegram's limits
+sender = SendScheduler(
+    global_rate=settings.SEND_GLOBAL_RATE_PER_SEC,
+    chat_rate=settings.SEND_CHAT_RATE_PER_MIN / 60,
+    chat_burst=settings.SEND_CHAT_BURST,
+    max_in_flight=settings.SEND_MAX_IN_FLIGHT,
+    max_uploads_in_flight=settings.SEND_MAX_UPLOADS_IN_FLIGHT,
+)
+
+# yt-dlp runs in its own processes; the module itself is only imported inside them
+ytdlp_pool = YtDlpPool(settings.YTDLP_MAX_WORKERS, settings.YTDLP_JOB_TIMEOUT_SEC)
+
+domain_guard = DomainGuard(
+    max_concurrent=settings.DOWNLOAD_MAX_CONCURRENT,
+    max_per_domain=settings.DOWNLOAD_MAX_PER_DOMAIN,
+    failure_threshold=settings.BREAKER_FAILURE_THRESHOLD,
+    cooldown_sec=settings.BREAKER_COOLDOWN_SEC,
+    neutral_exceptions=(YtDlpCancelled,),
+)
+encode_slots = asyncio.Semaphore(settings.ENCODE_MAX_CONCURRENT)
+pipeline_slots = asyncio.Semaphore(settings.PIPELINE_MAX_EPISODES)
+_episodes_in_progress = set()
+# Set once episodes left in flight by the last process are reset and the counters rebuilt
+pipeline_ready = asyncio.Event()
+
 def _is_admin(user_id: int) -> bool:
     return user_id in set(settings.ADMIN_USER_IDS or [])
 
+async def _reply(message, text: str, **kwargs):
+    return await sender.submit(
+        message.chat.id, lambda: message.reply_text(text, **kwargs), priority=PRIORITY_REPLY
+    )
+
 def _mask_user_id(uid: str) -> str:
     if not uid:
         return "N/A"
@@ -39,16 +81,19 @@ def _mask_user_id(uid: str) -> str:
 
 @app.on_message(filters.command("start"))
 async def start_handler(client, message):
-    await message.reply_text("Welcome. Send /help for commands.")
+    await _reply(message, "Welcome. Send /help for commands.")
 
 @app.on_message(filters.command("help"))
 async def help_handler(client, message):
-    await message.reply_text(
+    await _reply(message,
         "/upload <title> <url>\n"
         "/episode_add <series_id> <ep_number> <url>\n"
         "/process_pending\n"
-        "/status\n"
+        "/status [series_id]\n"
         "/settings_show\n\n"
+        "Channel profiles (admin):\n"
+        "/channel_set <channel_id> [key=value ...]\n"
+        "/channel_list\n\n"
         "Accounts (admin):\n"
         "/account_add <provider> <user_id> <password>\n"
         "/account_list\n"
@@ -61,13 +106,12 @@ async def help_handler(client, message):
         "/ytdlp_allow <domain>\n"
         "/ytdlp_disallow <domain>\n"
         "/ytdlp_list\n"
+        "/ytdlp_cancel <job_id>\n"
     )
 
 @app.on_message(filters.command("settings_show"))
 async def settings_show(client, message):
-    session = get_session()
-    ycount = session.query(YtDlpAllowedDomain).count()
-    session.close()
+    ycount = len(ytdlp_list_domains())
     text = (
         f"Prefix: {settings.NAME_PREFIX}\n"
         f"Suffix: {settings.NAME_SUFFIX}\n"
@@ -77,55 +121,45 @@ async def settings_show(client, message):
         f"WM Enabled: {settings.WATERMARK_ENABLED}\n"
         f"yt-dlp Enabled: {settings.YTDLP_ENABLED} (allowlisted domains: {ycount})"
     )
-    await message.reply_text(text)
+    await _reply(message, text)
 
 @app.on_message(filters.command("upload"))
 async def upload_handler(client, message):
     if len(message.command) < 3:
-        return await message.reply_text("Usage: /upload <title> <direct_media_url>")
+        return await _reply(message, "Usage: /upload <title> <direct_media_url>")
     title = message.command[1]
     source_url = message.command[2]
-    job_session = get_session()
-    job = Job(job_type="single_upload", status="pending", payload={"title": title, "source_url": source_url})
-    job_session.add(job)
-    job_session.commit()
-    job_session.refresh(job)
-    job_session.close()
-    await message.reply_text(f"Queued job id={job.id}")
+    job = job_insert("single_upload", {"title": title, "source_url": source_url})
+    await _reply(message, f"Queued job id={job['_id']}")
 
 @app.on_message(filters.command("episode_add"))
 async def episode_add(client, message):
     if len(message.command) < 4:
-        return await message.reply_text("Usage: /episode_add <series_id> <ep_number> <media_url>")
+        return await _reply(message, "Usage: /episode_add <series_id> <ep_number> <media_url>")
     series_id = message.command[1]
     try:
         ep_number = int(message.command[2])
     except ValueError:
-        return await message.reply_text("ep_number must be an integer")
+        return await _reply(message, "ep_number must be an integer")
     source_url = message.command[3]
-    session = get_session()
-    existing = session.query(Episode).filter_by(series_id=series_id, episode_number=ep_number).first()
-    if existing:
-        session.close()
-        return await message.reply_text("Episode already exists.")
-    ep = Episode(series_id=series_id, episode_number=ep_number, source_url=source_url, processed=False)
-    session.add(ep)
-    session.commit()
-    session.close()
-    await message.reply_text("Episode added.")
+    if episode_find_one(series_id, ep_number):
+        return await _reply(message, "Episode already exists.")
+    episode_insert(series_id, ep_number, source_url, processed=False)
+    await _reply(message, "Episode added.")
 
 @app.on_message(filters.command("process_pending"))
 async def process_pending(client, message):
-    session = get_session()
-    eps = session.query(Episode).filter_by(processed=False).all()
-    count = len(eps)
-    session.close()
+    if not pipeline_ready.is_set():
+        await _reply(message, "Still resetting interrupted episodes; processing starts when that finishes.")
+        await pipeline_ready.wait()
+    count = pending_count()
     asyncio.create_task(process_episode_queue())
-    await message.reply_text(f"Processing {count} pending episodes...")
+    await _reply(message, f"Processing {count} pending episodes...")
 
 async def _http_stream_to_file(url: str, dest_path: str, headers=None, cookies=None):
     import httpx
-    async with httpx.AsyncClient(timeout=None, headers=headers or {}, cookies=cookies or {}, follow_redirects=True) as client:
+    # Bounded per-read timeout so a stalled origin fails instead of hanging the queue
+    async with httpx.AsyncClient(timeout=settings.REQUEST_TIMEOUT, headers=headers or {}, cookies=cookies or {}, follow_redirects=True) as client:
         async with client.stream("GET", url) as r:
             r.raise_for_status()
             with open(dest_path, "wb") as f:
@@ -134,158 +168,378 @@ async def _http_stream_to_file(url: str, dest_path: str, headers=None, cookies=N
     return dest_path
 
 async def _is_ytdlp_allowed(domain: str) -> bool:
-    session = get_session()
-    try:
-        exists = session.query(YtDlpAllowedDomain).filter_by(domain=domain.lower()).first() is not None
-        return bool(exists)
-    finally:
-        session.close()
+    return ytdlp_is_allowed(domain)
 
-async def download_source(url: str, dest_path: str):
+async def download_source(url: str, dest_path: str, admit: Optional[asyncio.Semaphore] = None):
     """
     Lawful download only:
     - If a registered adapter exists for the domain, use it (official APIs).
     - Else, if yt-dlp is enabled and domain allowlisted, use yt-dlp to write file to dest_path.
     - Else, attempt a direct HTTP download of the provided URL.
+    Raises CircuitOpenError without contacting the origin if its domain keeps failing.
+    With `admit`, returns holding it; the caller releases it.
     """
     domain = normalize_domain(url)
+    async with domain_guard.slot(domain):
+        path = await _download_from_domain(domain, url, dest_path)
+        if admit is not None:
+            # The download slot is kept until the file is admitted, so a backed-up
+            # encoder stalls downloads instead of letting raw files pile up
+            await admit.acquire()
+        return path
+
+async def _download_from_domain(domain: str, url: str, dest_path: str):
     adapter = find_adapter_for_domain(domain)
     if adapter:
         headers = {}
         cookies = {}
         site_cred = fetch_site_credential_for_url(url)
-        user_id = site_cred.user_id if site_cred else None
+        user_id = site_cred["user_id"] if site_cred else None
         password = get_plain_password(site_cred) if site_cred else None
         task = await adapter.prepare_download(media_url=url, user_id=user_id, password=password)
         return await _http_stream_to_file(task.direct_url, dest_path, headers=task.headers or {}, cookies=task.cookies or {})
 
     if settings.YTDLP_ENABLED and await _is_ytdlp_allowed(domain):
         site_cred = fetch_site_credential_for_url(url)
-        username = site_cred.user_id if site_cred else None
+        username = site_cred["user_id"] if site_cred else None
         password = get_plain_password(site_cred) if site_cred else None
-        # Run yt-dlp synchronously in a thread to not block the loop
-        loop = asyncio.get_running_loop()
-        final_path = await loop.run_in_executor(None, download_with_ytdlp, url, dest_path, username, password)
-        return final_path
+        job_id = os.path.splitext(os.path.basename(dest_path))[0]
+        return await ytdlp_pool.download(job_id, url, dest_path, username, password)
 
     # Fallback: direct HTTP
     return await _http_stream_to_file(url, dest_path)
 
 async def process_episode_queue():
-    session = get_session()
-    unprocessed = session.query(Episode).filter_by(processed=False).all()
-    for ep in unprocessed:
-        try:
-            temp_dir = "work_tmp"
-            import os
-            os.makedirs(temp_dir, exist_ok=True)
-            raw_path = f"{temp_dir}/raw_{ep.series_id}_{ep.episode_number}.mp4"
-            await download_source(ep.source_url, raw_path)
-            meta = {"title": f"{ep.series_id} Episode {ep.episode_number}"}
-            if settings.WATERMARK_ENABLED:
-                wm_image = settings.WATERMARK_IMAGE_PATH if settings.WATERMARK_IMAGE_PATH else None
-                wm_text = settings.WATERMARK_TEXT if settings.WATERMARK_TEXT else None
-                orig_processed = f"{temp_dir}/original_{ep.series_id}_{ep.episode_number}.mp4"
-                await apply_watermark_and_metadata(raw_path, orig_processed, meta, img=wm_image, text=wm_text)
-                original_for_variants = orig_processed
+    """
+    Process all unprocessed episodes concurrently. Downloads are limited per
+    domain and skipped while that domain's circuit is open; ffmpeg runs at
+    most ENCODE_MAX_CONCURRENT at a time, and at most PIPELINE_MAX_EPISODES
+    downloaded sources wait for or go through encoding at once.
+    """
+    shorteners = lazy_import(".shorteners.base", __package__)
+    unprocessed = [
+        ep for ep in episode_find_all(processed=False)
+        if (ep["series_id"], ep["episode_number"]) not in _episodes_in_progress
+    ]
+    await asyncio.gather(*(_process_episode(ep, shorteners) for ep in unprocessed))
+
+def _rendition_file_name(ep, quality: str) -> str:
+    return build_filename(f"{ep['series_id']}_E{ep['episode_number']}", quality, settings.META_TAGS)
+
+async def _process_episode(ep, shorteners):
+    series_id, ep_number = ep["series_id"], ep["episode_number"]
+    key = (series_id, ep_number)
+    _episodes_in_progress.add(key)
+    retry = begin_run(ep)
+    # Counts finished raw sources waiting for or going through encoding; taken only
+    # once the file exists, so slow downloads never block other domains
+    holds_pipeline_slot = False
+    try:
+        profiles = channel_profiles_for_episode(ep)
+        if not profiles:
+            # Stays pending so it is published once some channel subscribes to the series
+            logger.warning("No enabled channel subscribes to episode %s %s; leaving it pending", series_id, ep_number)
+            set_state(ep, "pending")
+            return
+        # One work dir per episode so concurrent encodes never share output names
+        temp_dir = os.path.join("work_tmp", sanitize_filename(f"{series_id}_{ep_number}"))
+        os.makedirs(temp_dir, exist_ok=True)
+        ckpt = EpisodeCheckpoint(ep)
+        if ckpt.data:
+            logger.info("Resuming episode %s %s from checkpoint", series_id, ep_number)
+        # Encode and upload each rendition once, only if some channel wants it
+        needed = required_renditions(profiles, list(settings.TARGET_RES_MAP) + ["original"])
+        raw_path = None
+        if _needs_source(ep, ckpt, needed):
+            raw_path = await ckpt.source(ep["source_url"])
+            if raw_path is None:
+                set_state(ep, "downloading")
+                raw_path = await download_source(
+                    ep["source_url"], f"{temp_dir}/raw_{series_id}_{ep_number}.mp4", admit=pipeline_slots
+                )
+                holds_pipeline_slot = True
+                await ckpt.save_source(ep["source_url"], raw_path)
             else:
-                original_for_variants = raw_path
-            variants = await build_all_variants(
-                original_for_variants, temp_dir, settings.AUDIO_LANGUAGES_ALLOWED, settings.SUBTITLE_LANGUAGES_ALLOWED
-            )
-            file_links = {}
-            for quality, path in variants.items():
-                fname = build_filename(f"{ep.series_id}_E{ep.episode_number}", quality, settings.META_TAGS)
-                backend = storage_backends.get("telegram")
-                link_id = await backend.store_file(path, fname)
-                short_link = await shorten_url(link_id, settings.SHORTENER_PRIMARY, settings.SHORTENER_FALLBACKS)
-                file_links[quality] = short_link
-            buttons = []
-            for q, lnk in file_links.items():
-                buttons.append([InlineKeyboardButton(q, url=lnk)])
-            msg = await app.send_message(
-                chat_id=settings.PUBLISH_CHANNEL_ID,
-                text=f"{ep.series_id} Episode {ep.episode_number}",
-                reply_markup=InlineKeyboardMarkup(buttons[:settings.MAX_INLINE_BUTTONS])
+                await pipeline_slots.acquire()
+                holds_pipeline_slot = True
+        if not await _encode_and_publish(ep, ckpt, profiles, needed, raw_path, temp_dir, shorteners):
+            raise RuntimeError("not all channels were published")
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    except CircuitOpenError as e:
+        logger.info("Skipping episode %s %s for now: %s", series_id, ep_number, e)
+        set_state(ep, "pending")
+    except Exception as e:
+        logger.error("Error processing episode %s %s: %s", series_id, ep_number, e)
+        set_state(ep, "failed", {"failures": ep.get("failures", 0) + 1, "last_error": str(e)[:500]})
+    finally:
+        if holds_pipeline_slot:
+            pipeline_slots.release()
+        end_run(retry)
+        _episodes_in_progress.discard(key)
+
+def _needs_source(ep, ckpt, needed) -> bool:
+    """Whether a resume has to touch the source: some rendition is neither stored nor on disk, and the original isn't either."""
+    missing = [
+        q for q in needed
+        if ckpt.stored(q, rendition_params(q), _rendition_file_name(ep, q)) is None
+        and ckpt.rendition(q, rendition_params(q)) is None
+    ]
+    return bool(missing) and ckpt.rendition("original", rendition_params("original")) is None
+
+async def _prepare_original(ep, ckpt, raw_path, temp_dir) -> str:
+    series_id, ep_number = ep["series_id"], ep["episode_number"]
+    original_params = rendition_params("original")
+    original = ckpt.rendition("original", original_params)
+    if original is not None:
+        return original
+    if settings.WATERMARK_ENABLED:
+        meta = {"title": f"{series_id} Episode {ep_number}"}
+        wm_image = settings.WATERMARK_IMAGE_PATH if settings.WATERMARK_IMAGE_PATH else None
+        wm_text = settings.WATERMARK_TEXT if settings.WATERMARK_TEXT else None
+        original = f"{temp_dir}/original_{series_id}_{ep_number}.mp4"
+        async with encode_slots:
+            await apply_watermark_and_metadata(raw_path, original, meta, img=wm_image, text=wm_text)
+    else:
+        original = raw_path
+    ckpt.save_rendition("original", original, original_params)
+    return original
+
+async def _encode_and_publish(ep, ckpt, profiles, needed, raw_path, temp_dir, shorteners) -> bool:
+    """
+    Run the encode/store/shorten/publish stages, skipping any stage whose
+    checkpoint is still valid. Returns True once the episode is fully published.
+    """
+    series_id, ep_number = ep["series_id"], ep["episode_number"]
+    default_backend = _backend_name_for_episode(ep)
+    original = None
+    stored_links = {}
+    file_links = {}
+    for quality in needed:
+        params = rendition_params(quality)
+        fname = _rendition_file_name(ep, quality)
+        link_id = ckpt.stored(quality, params, fname)
+        if link_id is None:
+            path = ckpt.rendition(quality, params)
+            if path is None:
+                set_state(ep, "encoding")
+                # Resolved only when something actually has to be encoded from it
+                if original is None:
+                    original = await _prepare_original(ep, ckpt, raw_path, temp_dir)
+                if quality == "original":
+                    path = original
+                else:
+                    path = os.path.join(temp_dir, f"{quality}.mp4")
+                    dims = settings.TARGET_RES_MAP[quality]
+                    async with encode_slots:
+                        await transcode_variant(
+                            original, path, dims["width"], dims["height"],
+                            settings.AUDIO_LANGUAGES_ALLOWED, settings.SUBTITLE_LANGUAGES_ALLOWED
+                        )
+                    ckpt.save_rendition(quality, path, params)
+            backend_name = route_backend(storage_backends, path, quality, default_backend, settings)
+            set_state(ep, "uploading")
+            link_id = await storage_backends[backend_name].store_file(path, fname)
+            ckpt.save_stored(quality, params, backend_name, fname, link_id)
+        stored_links[quality] = link_id
+        short_link = ckpt.short_link(quality, link_id)
+        if short_link is None:
+            short_link = await shorteners.shorten_url(link_id, settings.SHORTENER_PRIMARY, settings.SHORTENER_FALLBACKS)
+            if short_link != link_id:
+                ckpt.save_short_link(quality, link_id, short_link)
+        file_links[quality] = short_link
+    set_state(ep, "publishing")
+    published = await publish_to_channels(ep, profiles, stored_links, file_links)
+    if len(published) < len(profiles):
+        return False
+    set_state(ep, "processed", {
+        "processed": True,
+        "published_message_id": next(iter(published.values()), None),
+    })
+    return True
+
+def _backend_name_for_episode(ep) -> str:
+    if ep.get("storage_profile_name"):
+        profile = storage_profile_find_one(ep["storage_profile_name"])
+        if profile and profile.get("backend") in storage_backends:
+            return profile["backend"]
+    return "telegram"
+
+async def publish_to_channels(ep, profiles, stored_links, file_links):
+    """
+    Fan one encoded episode out to every subscribed channel. Files are never
+    re-uploaded: posts link to the stored copies and, when a profile asks for
+    files, they are re-sent by Telegram file_id. Returns {channel_id: message_id}
+    for the channels published so far, including earlier attempts.
+    """
+    published = dict(ep.get("published_message_ids") or {})
+    files_sent = ep.get("published_files") or {}
+    title = f"{ep['series_id']} Episode {ep['episode_number']}"
+    for profile in profiles:
+        chat_id = profile["publish_channel_id"]
+        if str(chat_id) in published:
+            continue
+        try:
+            if profile["send_files"]:
+                sent_here = files_sent.setdefault(str(chat_id), {})
+                for quality, link in select_links(profile, stored_links).items():
+                    file_id = telegram_file_id(link)
+                    if not file_id or quality in sent_here:
+                        continue
+                    msg = await sender.submit(
+                        chat_id,
+                        lambda c=chat_id, f=file_id, q=quality: app.send_cached_media(chat_id=c, file_id=f, caption=f"{title} [{q}]"),
+                        priority=PRIORITY_PUBLISH
+                    )
+                    # Each file is recorded as soon as it is sent, so a retry resumes after it
+                    sent_here[quality] = msg.id
+                    episode_update(ep["series_id"], ep["episode_number"], {f"published_files.{chat_id}.{quality}": msg.id})
+            text, markup = build_post(profile, title, file_links)
+            msg = await sender.submit(
+                chat_id,
+                lambda c=chat_id, t=text, m=markup: app.send_message(chat_id=c, text=t, reply_markup=m),
+                priority=PRIORITY_PUBLISH
             )
-            ep.processed = True
-            ep.published_message_id = msg.id
-            session.add(ep)
-            session.commit()
+            published[str(chat_id)] = msg.id
+            # Recorded once the post is out; a retry skips this channel entirely
+            episode_update(ep["series_id"], ep["episode_number"], {f"published_message_ids.{chat_id}": msg.id})
         except Exception as e:
-            logger.error("Error processing episode %s %s: %s", ep.series_id, ep.episode_number, e)
-    session.close()
+            logger.error("Error publishing %s to %s: %s", title, chat_id, e)
+    return published
+
+# --- Channel publishing profiles (Admin only) ---
+
+@app.on_message(filters.command("channel_set"))
+async def channel_set_handler(client, message):
+    if not message.from_user or not _is_admin(message.from_user.id):
+        return await _reply(message, "Unauthorized.")
+    if len(message.command) < 2:
+        return await _reply(message, "Usage: /channel_set <channel_id> [key=value ...]\nFields: " + ", ".join(PROFILE_FIELDS))
+    try:
+        channel_id = int(message.command[1])
+        fields = parse_profile_args(message.command[2:])
+    except ValueError as e:
+        return await _reply(message, f"Invalid arguments: {e}")
+    existing = channel_config_find_one(channel_id) or {}
+    existing.pop("_id", None)
+    existing.pop("publish_channel_id", None)
+    existing.update(fields)
+    channel_config_insert_or_update(channel_id, **existing)
+    await _reply(message, f"Channel {channel_id} profile saved.")
+
+@app.on_message(filters.command("channel_list"))
+async def channel_list_handler(client, message):
+    if not message.from_user or not _is_admin(message.from_user.id):
+        return await _reply(message, "Unauthorized.")
+    configs = channel_config_find_all()
+    if not configs:
+        return await _reply(message, f"No channel profiles; publishing to PUBLISH_CHANNEL_ID={settings.PUBLISH_CHANNEL_ID}.")
+    lines = ["Channel profiles:"]
+    for cfg in configs:
+        fields = ", ".join(f"{k}={cfg[k]}" for k in PROFILE_FIELDS if k in cfg)
+        lines.append(f"- {cfg['publish_channel_id']}: {fields or 'defaults'}")
+    await _reply(message, "\n".join(lines))
 
 # --- yt-dlp allowlist management (Admin only) ---
 
 @app.on_message(filters.command("ytdlp_allow"))
 async def ytdlp_allow_handler(client, message):
     if not message.from_user or not _is_admin(message.from_user.id):
-        return await message.reply_text("Unauthorized.")
+        return await _reply(message, "Unauthorized.")
     if len(message.command) < 2:
-        return await message.reply_text("Usage: /ytdlp_allow <domain>")
+        return await _reply(message, "Usage: /ytdlp_allow <domain>")
     domain = message.command[1].lower()
-    session = get_session()
-    existing = session.query(YtDlpAllowedDomain).filter_by(domain=domain).first()
-    if existing:
-        session.close()
-        return await message.reply_text("Already allowlisted.")
-    dom = YtDlpAllowedDomain(domain=domain)
-    session.add(dom)
-    session.commit()
-    session.close()
-    await message.reply_text(f"yt-dlp allowlisted: {domain}")
+    if ytdlp_is_allowed(domain):
+        return await _reply(message, "Already allowlisted.")
+    ytdlp_allow_domain(domain)
+    await _reply(message, f"yt-dlp allowlisted: {domain}")
 
 @app.on_message(filters.command("ytdlp_disallow"))
 async def ytdlp_disallow_handler(client, message):
     if not message.from_user or not _is_admin(message.from_user.id):
-        return await message.reply_text("Unauthorized.")
+        return await _reply(message, "Unauthorized.")
     if len(message.command) < 2:
-        return await message.reply_text("Usage: /ytdlp_disallow <domain>")
+        return await _reply(message, "Usage: /ytdlp_disallow <domain>")
     domain = message.command[1].lower()
-    session = get_session()
-    dom = session.query(YtDlpAllowedDomain).filter_by(domain=domain).first()
-    if not dom:
-        session.close()
-        return await message.reply_text("Domain not found in allowlist.")
-    session.delete(dom)
-    session.commit()
-    session.close()
-    await message.reply_text(f"yt-dlp disallowed: {domain}")
+    if not ytdlp_is_allowed(domain):
+        return await _reply(message, "Domain not found in allowlist.")
+    ytdlp_disallow_domain(domain)
+    await _reply(message, f"yt-dlp disallowed: {domain}")
 
 @app.on_message(filters.command("ytdlp_list"))
 async def ytdlp_list_handler(client, message):
     if not message.from_user or not _is_admin(message.from_user.id):
-        return await message.reply_text("Unauthorized.")
-    session = get_session()
-    items = session.query(YtDlpAllowedDomain).order_by(YtDlpAllowedDomain.domain.asc()).all()
-    session.close()
+        return await _reply(message, "Unauthorized.")
+    items = sorted(ytdlp_list_domains())
     if not items:
-        return await message.reply_text("yt-dlp allowlist is empty. Set YTDLP_ENABLED=true and add domains.")
+        return await _reply(message, "yt-dlp allowlist is empty. Set YTDLP_ENABLED=true and add domains.")
     lines = ["yt-dlp allowlist:"]
     for it in items:
-        lines.append(f"- {it.domain}")
-    await message.reply_text("\n".join(lines))
+        lines.append(f"- {it}")
+    await _reply(message, "\n".join(lines))
+
+@app.on_message(filters.command("ytdlp_cancel"))
+async def ytdlp_cancel_handler(client, message):
+    if not message.from_user or not _is_admin(message.from_user.id):
+        return await _reply(message, "Unauthorized.")
+    if len(message.command) < 2:
+        return await _reply(message, "Usage: /ytdlp_cancel <job_id> (see /status)")
+    job_id = message.command[1]
+    if not ytdlp_pool.cancel(job_id):
+        return await _reply(message, "No such yt-dlp job.")
+    await _reply(message, f"yt-dlp job cancelled: {job_id}")
 
 @app.on_message(filters.command("status"))
 async def status_handler(client, message):
-    session = get_session()
-    total = session.query(Episode).count()
-    done = session.query(Episode).filter_by(processed=True).count()
-    session.close()
-    await message.reply_text(f"Episodes total={total}, processed={done}")
+    series_id = message.command[1] if len(message.command) > 1 else None
+    q = sender.stats()
+    lines = format_status(series_id) + [
+        f"Send queue: queued={q['queued']}, in_flight={q['in_flight']}, uploading={q['uploading']}, flood_waits={q['flood_waits']}",
+    ]
+    breaker_lines = domain_guard.status_lines()
+    if breaker_lines:
+        lines.append("Domains:")
+        lines.extend(f"- {line}" for line in breaker_lines)
+    feed_lines = feed_status_lines()
+    if feed_lines:
+        lines.append("Feeds:")
+        lines.extend(f"- {line}" for line in feed_lines)
+    for job_id, progress in ytdlp_pool.active_jobs().items():
+        lines.append(f"yt-dlp {job_id}: {format_progress(progress)}")
+    await _reply(message, "\n".join(lines))
 
 async def startup():
-    init_db()
-    init_registry()
+    # Site adapters, shorteners and yt-dlp are not loaded here; they are
+    # imported the first time a download or publish needs them.
     global storage_backends
-    storage_backends = build_backends(app, settings)
+    with timed("init_db"):
+        init_db()
+    with timed("build_backends"):
+        storage_backends = build_backends(app, settings, sender)
     logger.info("Bot started (yt-dlp enabled=%s).", settings.YTDLP_ENABLED)
 
+async def _prepare_pipeline():
+    # Runs after the client starts; /process_pending and the feeds wait for it,
+    # so no run starts while in-flight states are reset and the counters rebuilt
+    with timed("reconcile counters"):
+        await asyncio.to_thread(reconcile, True)
+    pipeline_ready.set()
+    logger.info("Pipeline ready %.0f ms after process start.", since_process_start() * 1000)
+    asyncio.create_task(reconcile_loop(lambda: bool(_episodes_in_progress)))
+    if settings.ENABLE_AUTO_SCHEDULER:
+        asyncio.create_task(scheduler_loop())
+
+async def _run():
+    await startup()
+    with timed("client start"):
+        await app.start()
+    logger.info("Accepting updates %.0f ms after process start.", since_process_start() * 1000)
+    await _prepare_pipeline()
+    logger.info(startup_report())
+    await idle()
+    await app.stop()
+
 def main():
-    app.add_handler  # placeholder
-    app.run()
+    app.run(_run())
 
 if __name__ == "__main__":
-    asyncio.get_event_loop().run_until_complete(startup())
     main()
@@ -0,0 +1,98 @@
+import asyncio, hashlib, os
+from typing import Dict, Optional
+from .config import settings
+from .db import episode_update
+
+# Per-episode stage checkpoints live under `checkpoint` on the episode document:
+#   source:      {url, path, sha256, size}
+#   renditions:  {label: {path, size, params}}
+#   stored:      {label: {backend, file_name, params, link}}
+#   short_links: {label: {link, short}}
+# Each stage records the inputs it was produced from, so a change to
+# TARGET_RES_MAP, watermark, language or MP4 output settings invalidates
+# exactly the stages that depend on it.
+
+def watermark_params() -> Optional[Dict]:
+    if not settings.WATERMARK_ENABLED:
+        return None
+    return {"image": settings.WATERMARK_IMAGE_PATH or None, "text": settings.WATERMARK_TEXT or None}
+
+def rendition_params(label: str) -> Dict:
+    params = {"watermark": watermark_params()}
+    if settings.WATERMARK_ENABLED or label != "original":
+        # Only encoded/remuxed outputs carry the MP4 layout; an unwatermarked original is the source as-is
+        params["mp4_mode"] = settings.MP4_OUTPUT_MODE
+    if label != "original":
+        dims = settings.TARGET_RES_MAP[label]
+        params.update({
+            "width": dims["width"],
+            "height": dims["height"],
+            "audio_langs": list(settings.AUDIO_LANGUAGES_ALLOWED),
+            "sub_langs": list(settings.SUBTITLE_LANGUAGES_ALLOWED),
+        })
+    return params
+
+def _file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _file_ok(path: Optional[str], size: Optional[int]) -> bool:
+    return bool(path) and os.path.isfile(path) and os.path.getsize(path) == size
+
+class EpisodeCheckpoint:
+    """Read and record pipeline stages for one episode; each save is persisted immediately."""
+
+    def __init__(self, ep: Dict):
+        self.series_id = ep["series_id"]
+        self.episode_number = ep["episode_number"]
+        self.data = ep.get("checkpoint") or {}
+
+    def _save(self, stage: str, key: Optional[str], value):
+        field = f"checkpoint.{stage}" + (f".{key}" if key else "")
+        episode_update(self.series_id, self.episode_number, {field: value})
+        if key:
+            self.data.setdefault(stage, {})[key] = value
+        else:
+            self.data[stage] = value
+
+    async def source(self, url: str) -> Optional[str]:
+        """The downloaded source, if it is still on disk with the recorded size and sha256."""
+        rec = self.data.get("source") or {}
+        if rec.get("url") != url or not _file_ok(rec.get("path"), rec.get("size")):
+            return None
+        if await asyncio.to_thread(_file_sha256, rec["path"]) != rec.get("sha256"):
+            return None
+        return rec["path"]
+
+    async def save_source(self, url: str, path: str):
+        sha256 = await asyncio.to_thread(_file_sha256, path)
+        self._save("source", None, {"url": url, "path": path, "sha256": sha256, "size": os.path.getsize(path)})
+
+    def rendition(self, label: str, params: Dict) -> Optional[str]:
+        rec = (self.data.get("renditions") or {}).get(label) or {}
+        if rec.get("params") == params and _file_ok(rec.get("path"), rec.get("size")):
+            return rec["path"]
+        return None
+
+    def save_rendition(self, label: str, path: str, params: Dict):
+        self._save("renditions", label, {"path": path, "size": os.path.getsize(path), "params": params})
+
+    def stored(self, label: str, params: Dict, file_name: str) -> Optional[str]:
+        # Whichever backend it went to, a stored copy of the same encode and name stays valid
+        rec = (self.data.get("stored") or {}).get(label) or {}
+        if rec.get("params") == params and rec.get("file_name") == file_name:
+            return rec.get("link")
+        return None
+
+    def save_stored(self, label: str, params: Dict, backend: str, file_name: str, link: str):
+        self._save("stored", label, {"backend": backend, "file_name": file_name, "params": params, "link": link})
+
+    def short_link(self, label: str, link: str) -> Optional[str]:
+        rec = (self.data.get("short_links") or {}).get(label) or {}
+        return rec.get("short") if rec.get("link") == link else None
+
+    def save_short_link(self, label: str, link: str, short: str):
+        self._save("short_links", label, {"link": link, "short": short})
@@ -11,11 +11,34 @@ class Settings(BaseSettings):
     DATABASE_URL: str = "sqlite:///./data/db.sqlite3"
     REDIS_URL: Optional[str] = None
     MAX_INLINE_BUTTONS: int = 5
+    # Outbound Bot API rate shaping (Telegram allows ~30 msg/s overall, ~20 msg/min per channel)
+    SEND_GLOBAL_RATE_PER_SEC: float = 25.0
+    SEND_CHAT_RATE_PER_MIN: int = 20
+    SEND_CHAT_BURST: int = 3
+    SEND_MAX_IN_FLIGHT: int = 4  # replies and publishes
+    SEND_MAX_UPLOADS_IN_FLIGHT: int = 2  # dump-channel uploads, limited separately
     REQUEST_TIMEOUT: int = 30
+    DOWNLOAD_MAX_CONCURRENT: int = 4
+    DOWNLOAD_MAX_PER_DOMAIN: int = 2
+    ENCODE_MAX_CONCURRENT: int = 1
+    PIPELINE_MAX_EPISODES: int = 2  # downloaded sources waiting for or in encoding; caps raw files in work_tmp
+    BREAKER_FAILURE_THRESHOLD: int = 3  # consecutive failures before a domain is skipped
+    BREAKER_COOLDOWN_SEC: int = 600
     SHORTENER_PRIMARY: str = "tinyurl"
     SHORTENER_FALLBACKS: List[str] = ["isgd"]
     STORAGE_BACKENDS: List[str] = ["telegram"]
     EXTERNAL_LARGE_FILE_THRESHOLD_BYTES: int = 4 * 1024 * 1024 * 1024  # 4GB
+    STORAGE_LARGE_FILE_BACKEND: str = "s3"  # used for files >= the threshold, if configured
+    STORAGE_ROUTE_BY_LABEL: dict = {}  # e.g. {"original": "s3"}
+    S3_ENDPOINT_URL: Optional[str] = None  # None = AWS; set for MinIO/R2/etc.
+    S3_BUCKET: Optional[str] = None
+    S3_ACCESS_KEY: Optional[str] = None
+    S3_SECRET_KEY: Optional[str] = None
+    S3_REGION: Optional[str] = None
+    S3_KEY_PREFIX: str = ""
+    S3_PUBLIC_BASE_URL: Optional[str] = None  # required with s3: bucket/CDN URL the keys are served under
+    S3_PART_SIZE_MB: int = 32
+    S3_MAX_CONCURRENCY: int = 4
     WATERMARK_ENABLED: bool = False
     WATERMARK_IMAGE_PATH: Optional[str] = None
     WATERMARK_TEXT: Optional[str] = None
@@ -24,6 +47,11 @@ class Settings(BaseSettings):
     META_TAGS: List[str] = []
     ENABLE_AUTO_SCHEDULER: bool = True
     AUTO_POLL_INTERVAL_MIN: int = 30
+    AUTO_POLL_MIN_INTERVAL_MIN: int = 5
+    AUTO_POLL_MAX_INTERVAL_MIN: int = 6 * 60
+    AUTO_POLL_JITTER: float = 0.1  # +/- fraction applied to each feed's interval
+    AUTO_FEED_MAX_CONCURRENT: int = 4
+    STATUS_RECONCILE_INTERVAL_MIN: int = 60
     VALID_VIDEO_RESOLUTIONS: List[str] = ["480p", "720p", "1080p", "original"]
     TARGET_RES_MAP: dict = {
         "480p": {"width": 854, "height": 480},
@@ -33,10 +61,13 @@ class Settings(BaseSettings):
     AUDIO_LANGUAGES_ALLOWED: List[str] = ["en"]
     SUBTITLE_LANGUAGES_ALLOWED: List[str] = ["en"]
     FFMPEG_LOGLEVEL: str = "error"
+    MP4_OUTPUT_MODE: str = "fragmented"  # fragmented | faststart | plain
     ENCRYPTION_KEY: str  # Fernet key (base64 urlsafe)
 
     # New: yt-dlp global toggle (disabled by default)
     YTDLP_ENABLED: bool = False
+    YTDLP_MAX_WORKERS: int = 2  # concurrent yt-dlp worker processes
+    YTDLP_JOB_TIMEOUT_SEC: int = 3 * 60 * 60
 
     class Config:
         env_file = ".env"
@@ -1,4 +1,3 @@
-from pymongo import MongoClient
 import os
 from datetime import datetime
 
@@ -6,13 +5,28 @@ from datetime import datetime
 MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017/")
 DBNAME = os.getenv("DBNAME", "ottbotdb")
 
-client = MongoClient(MONGODB_URI)
-db = client[DBNAME]
+# Connected by init_db() during startup, not at import time
+client = None
+db = None
+
+def init_db():
+    """Connect to MongoDB. Safe to call more than once."""
+    global client, db
+    if db is None:
+        from pymongo import MongoClient
+        client = MongoClient(MONGODB_URI)
+        db = client[DBNAME]
+        # The startup reset of in-flight episodes filters on state
+        db.episodes.create_index("state")
+    return db
+
+def get_db():
+    return db if db is not None else init_db()
 
 # --- Example utility functions and collection access ---
 
 def episode_find_one(series_id, episode_number):
-    return db.episodes.find_one({"series_id": series_id, "episode_number": episode_number})
+    return get_db().episodes.find_one({"series_id": series_id, "episode_number": episode_number})
 
 def episode_insert(series_id, episode_number, source_url, processed=False, publish_channel_id=None, storage_profile_name=None, meta=None):
     doc = {
@@ -23,22 +37,62 @@ def episode_insert(series_id, episode_number, source_url, processed=False, publi
         "publish_channel_id": publish_channel_id,
         "storage_profile_name": storage_profile_name,
         "meta": meta if meta else {},
+        "state": "processed" if processed else "pending",
         "created_at": datetime.utcnow()
     }
-    db.episodes.insert_one(doc)
+    get_db().episodes.insert_one(doc)
+    counters_inc(series_id, {f"states.{doc['state']}": 1})
     return doc
 
 def episode_update(series_id, episode_number, fields):
-    db.episodes.update_one(
+    get_db().episodes.update_one(
         {"series_id": series_id, "episode_number": episode_number},
         {"$set": fields}
     )
 
+def episode_transition_state(series_id, episode_number, old_state, new_state, extra=None):
+    """
+    Move an episode from old_state to new_state and adjust the counters.
+    The compare-and-set on `state` keeps counters exact under concurrent
+    updates; returns False if the episode was no longer in old_state.
+    The episode update and the counter $inc are two separate writes, so a
+    crash between them leaves the counters off until the next reconcile.
+    """
+    # Episodes stored before states existed have no `state`; null matches missing
+    match = {"series_id": series_id, "episode_number": episode_number, "state": {"$in": [old_state, None]}}
+    fields = dict(extra or {})
+    fields["state"] = new_state
+    res = get_db().episodes.update_one(match, {"$set": fields})
+    if res.modified_count and old_state != new_state:
+        counters_inc(series_id, {f"states.{old_state}": -1, f"states.{new_state}": 1})
+    return bool(res.modified_count)
+
+def episode_state_breakdown():
+    """Aggregate episode counts per (series_id, state); used to reconcile counters."""
+    return list(get_db().episodes.aggregate([
+        {"$group": {
+            "_id": {
+                "series_id": "$series_id",
+                "state": {"$ifNull": ["$state", {"$cond": ["$processed", "processed", "pending"]}]},
+            },
+            "count": {"$sum": 1},
+        }},
+    ]))
+
+def episode_reset_states(from_states, to_state):
+    get_db().episodes.update_many({"state": {"$in": list(from_states)}}, {"$set": {"state": to_state}})
+
 def episode_find_all(processed=None):
     query = {}
     if processed is not None:
         query["processed"] = processed
-    return list(db.episodes.find(query))
+    return list(get_db().episodes.find(query))
+
+def episode_count(processed=None):
+    query = {}
+    if processed is not None:
+        query["processed"] = processed
+    return get_db().episodes.count_documents(query)
 
 def job_insert(job_type, payload, status="pending", result=None):
     doc = {
@@ -48,11 +102,32 @@ def job_insert(job_type, payload, status="pending", result=None):
         "result": result if result else {},
         "created_at": datetime.utcnow()
     }
-    db.jobs.insert_one(doc)
+    get_db().jobs.insert_one(doc)
+    counters_inc(None, {f"jobs.{status}": 1})
     return doc
 
 def job_find_by_status(status):
-    return list(db.jobs.find({"status": status}))
+    return list(get_db().jobs.find({"status": status}))
+
+def job_status_breakdown():
+    return list(get_db().jobs.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]))
+
+# --- Materialized status counters ---
+# One document for all episodes ("all") and one per series ("series:<id>"),
+# maintained with $inc as episodes change state and rebuilt by reconciliation.
+
+def counters_inc(series_id, incs):
+    get_db().counters.update_one({"_id": "all"}, {"$inc": incs}, upsert=True)
+    if series_id is not None:
+        get_db().counters.update_one({"_id": f"series:{series_id}"}, {"$inc": incs}, upsert=True)
+
+def counters_find_one(counter_id):
+    return get_db().counters.find_one({"_id": counter_id}) or {}
+
+def counters_replace_all(docs):
+    for doc in docs:
+        get_db().counters.replace_one({"_id": doc["_id"]}, doc, upsert=True)
+    get_db().counters.delete_many({"_id": {"$nin": [d["_id"] for d in docs]}})
 
 def account_insert(provider, user_id, password_enc):
     doc = {
@@ -61,7 +136,7 @@ def account_insert(provider, user_id, password_enc):
         "password_enc": password_enc,
         "created_at": datetime.utcnow()
     }
-    db.accounts.replace_one(
+    get_db().accounts.replace_one(
         {"provider": provider, "user_id": user_id},
         doc,
         upsert=True
@@ -69,10 +144,10 @@ def account_insert(provider, user_id, password_enc):
     return doc
 
 def account_find_all():
-    return list(db.accounts.find({}))
+    return list(get_db().accounts.find({}))
 
 def account_delete(provider, user_id):
-    db.accounts.delete_one({"provider": provider, "user_id": user_id})
+    get_db().accounts.delete_one({"provider": provider, "user_id": user_id})
 
 def site_credential_insert(domain, user_id, password_enc):
     doc = {
@@ -81,7 +156,7 @@ def site_credential_insert(domain, user_id, password_enc):
         "password_enc": password_enc,
         "created_at": datetime.utcnow()
     }
-    db.site_credentials.replace_one(
+    get_db().site_credentials.replace_one(
         {"domain": domain, "user_id": user_id},
         doc,
         upsert=True
@@ -89,10 +164,13 @@ def site_credential_insert(domain, user_id, password_enc):
     return doc
 
 def site_credential_find_all():
-    return list(db.site_credentials.find({}))
+    return list(get_db().site_credentials.find({}))
+
+def site_credential_find_by_domain(domain):
+    return get_db().site_credentials.find_one({"domain": domain.lower()})
 
 def site_credential_delete(domain, user_id):
-    db.site_credentials.delete_one({"domain": domain, "user_id": user_id})
+    get_db().site_credentials.delete_one({"domain": domain, "user_id": user_id})
 
 def storage_profile_insert(name, backend, config, telegram_bot_token_enc=None):
     doc = {
@@ -102,7 +180,7 @@ def storage_profile_insert(name, backend, config, telegram_bot_token_enc=None):
         "telegram_bot_token_enc": telegram_bot_token_enc,
         "created_at": datetime.utcnow()
     }
-    db.storage_profiles.replace_one(
+    get_db().storage_profiles.replace_one(
         {"name": name},
         doc,
         upsert=True
@@ -110,19 +188,19 @@ def storage_profile_insert(name, backend, config, telegram_bot_token_enc=None):
     return doc
 
 def storage_profile_find_all():
-    return list(db.storage_profiles.find({}))
+    return list(get_db().storage_profiles.find({}))
 
 def storage_profile_find_one(name):
-    return db.storage_profiles.find_one({"name": name})
+    return get_db().storage_profiles.find_one({"name": name})
 
 def storage_profile_delete(name):
-    db.storage_profiles.delete_one({"name": name})
+    get_db().storage_profiles.delete_one({"name": name})
 
 def channel_config_insert_or_update(publish_channel_id, **kwargs):
     doc = kwargs.copy()
     doc["publish_channel_id"] = publish_channel_id
     doc.setdefault("created_at", datetime.utcnow())
-    db.channel_configs.replace_one(
+    get_db().channel_configs.replace_one(
         {"publish_channel_id": publish_channel_id},
         doc,
         upsert=True
@@ -130,17 +208,23 @@ def channel_config_insert_or_update(publish_channel_id, **kwargs):
     return doc
 
 def channel_config_find_one(publish_channel_id):
-    return db.channel_configs.find_one({"publish_channel_id": publish_channel_id})
+    return get_db().channel_configs.find_one({"publish_channel_id": publish_channel_id})
 
 def channel_config_find_all():
-    return list(db.channel_configs.find({}))
+    return list(get_db().channel_configs.find({}))
+
+def feed_state_find_one(name):
+    return get_db().feed_states.find_one({"name": name})
+
+def feed_state_update(name, fields):
+    get_db().feed_states.update_one({"name": name}, {"$set": fields}, upsert=True)
 
 def ytdlp_allow_domain(domain):
     doc = {
         "domain": domain.lower(),
         "created_at": datetime.utcnow()
     }
-    db.ytdlp_allowed_domains.replace_one(
+    get_db().ytdlp_allowed_domains.replace_one(
         {"domain": domain.lower()},
         doc,
         upsert=True
@@ -148,9 +232,11 @@ def ytdlp_allow_domain(domain):
     return doc
 
 def ytdlp_disallow_domain(domain):
-    db.ytdlp_allowed_domains.delete_one({"domain": domain.lower()})
+    get_db().ytdlp_allowed_domains.delete_one({"domain": domain.lower()})
+
+def ytdlp_is_allowed(domain):
+    return get_db().ytdlp_allowed_domains.find_one({"domain": domain.lower()}) is not None
 
 def ytdlp_list_domains():
-    return [d["domain"] for d in db.ytdlp_allowed_domains.find({})]
+    return [d["domain"] for d in get_db().ytdlp_allowed_domains.find({})]
 
-# --- No "init_db" needed for MongoDB ---
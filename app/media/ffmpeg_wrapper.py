@@ -1,9 +1,25 @@
-import asyncio, json, os, logging
+import asyncio, json, logging
 from typing import List, Dict
 from ..config import settings
 
 logger = logging.getLogger("ffmpeg")
 
+# How the MP4 muxer lays out the file, chosen by MP4_OUTPUT_MODE. "fragmented" writes
+# moov up front and media in fragments as it goes, so the file streams without a second
+# pass; "faststart" rewrites the whole file when muxing finishes to move moov forward.
+# Telegram gets the duration from the upload call either way (see TelegramStorage).
+MP4_MOVFLAGS = {
+    "plain": [],
+    "faststart": ["-movflags", "+faststart"],
+    "fragmented": ["-movflags", "+frag_keyframe+empty_moov+default_base_moof"],
+}
+
+def mp4_output_args() -> List[str]:
+    mode = settings.MP4_OUTPUT_MODE
+    if mode not in MP4_MOVFLAGS:
+        raise ValueError(f"MP4_OUTPUT_MODE must be one of {', '.join(MP4_MOVFLAGS)}, got {mode!r}")
+    return MP4_MOVFLAGS[mode]
+
 async def run_cmd(cmd: List[str]):
     proc = await asyncio.create_subprocess_exec(
         *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
@@ -41,7 +57,7 @@ async def apply_watermark_and_metadata(input_path: str, output_path: str, metada
     cmd = ["ffmpeg","-y","-i", input_path]
     if vf:
         cmd += ["-vf", vf]
-    cmd += meta_args + ["-c","copy", output_path]
+    cmd += meta_args + ["-c","copy", *mp4_output_args(), output_path]
     await run_cmd(cmd)
 
 async def transcode_variant(input_path: str, output_path: str, target_w: int, target_h: int, audio_langs: List[str], sub_langs: List[str]):
@@ -61,15 +77,7 @@ async def transcode_variant(input_path: str, output_path: str, target_w: int, ta
         "-vf", f"scale=w={target_w}:h={target_h}:force_original_aspect_ratio=decrease",
         "-c:a","aac","-b:a","128k",
         "-c:s","copy",
+        *mp4_output_args(),
         output_path
     ]
     await run_cmd(cmd)
-
-async def build_all_variants(original_input: str, work_dir: str, audio_langs: List[str], sub_langs: List[str]):
-    outputs = {}
-    for label, dims in settings.TARGET_RES_MAP.items():
-        out_path = os.path.join(work_dir, f"{label}.mp4")
-        await transcode_variant(original_input, out_path, dims["width"], dims["height"], audio_langs, sub_langs)
-        outputs[label] = out_path
-    outputs["original"] = original_input
-    return outputs
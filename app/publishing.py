@@ -0,0 +1,109 @@
+from typing import Dict, List, Optional, Tuple
+from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from .config import settings
+from .db import channel_config_find_all, channel_config_find_one
+
+# Per-channel publishing profile fields stored on channel_configs documents.
+# List fields are given comma separated in /channel_set.
+PROFILE_FIELDS = {
+    "renditions": list,       # rendition labels to include; empty = all
+    "series_ids": list,       # series this channel subscribes to; empty = all
+    "buttons_per_row": int,
+    "max_buttons": int,
+    "name_prefix": str,
+    "name_suffix": str,
+    "meta_tags": list,
+    "send_files": bool,       # also post the files themselves (by file_id, no re-upload)
+    "enabled": bool,
+}
+
+TG_FILE_LINK_PREFIX = "tg://file_id/"
+
+def default_profile(publish_channel_id: int) -> Dict:
+    return {
+        "publish_channel_id": publish_channel_id,
+        "renditions": [],
+        "series_ids": [],
+        "buttons_per_row": 1,
+        "max_buttons": settings.MAX_INLINE_BUTTONS,
+        "name_prefix": settings.NAME_PREFIX,
+        "name_suffix": settings.NAME_SUFFIX,
+        "meta_tags": list(settings.META_TAGS),
+        "send_files": False,
+        "enabled": True,
+    }
+
+def parse_profile_args(args: List[str]) -> Dict:
+    """Parse `key=value` tokens from /channel_set into profile fields."""
+    fields = {}
+    for arg in args:
+        if "=" not in arg:
+            raise ValueError(f"Expected key=value, got: {arg}")
+        key, value = arg.split("=", 1)
+        kind = PROFILE_FIELDS.get(key)
+        if kind is None:
+            raise ValueError(f"Unknown field: {key}")
+        if kind is list:
+            fields[key] = [v for v in value.split(",") if v]
+            if key == "renditions":
+                known = list(settings.TARGET_RES_MAP) + ["original"]
+                unknown = [v for v in fields[key] if v not in known]
+                if unknown:
+                    raise ValueError(f"Unknown rendition(s) {', '.join(unknown)}; expected any of {', '.join(known)}")
+        elif kind is int:
+            fields[key] = int(value)
+        elif kind is bool:
+            fields[key] = value.lower() in ("1", "true", "yes", "on")
+        else:
+            fields[key] = value
+    return fields
+
+def channel_profiles_for_episode(ep: Dict) -> List[Dict]:
+    """
+    Resolve the channels an episode is published to, each merged over the defaults.
+    An episode pinned to a publish_channel_id goes only there; otherwise every
+    enabled channel config subscribed to the series. Without any channel
+    configs the single PUBLISH_CHANNEL_ID is used.
+    """
+    if ep.get("publish_channel_id"):
+        configs = [channel_config_find_one(ep["publish_channel_id"]) or {"publish_channel_id": ep["publish_channel_id"]}]
+    else:
+        configs = channel_config_find_all() or [{"publish_channel_id": settings.PUBLISH_CHANNEL_ID}]
+    profiles = []
+    for cfg in configs:
+        profile = default_profile(cfg["publish_channel_id"])
+        profile.update({k: v for k, v in cfg.items() if k in PROFILE_FIELDS})
+        if not profile["enabled"]:
+            continue
+        if profile["series_ids"] and ep["series_id"] not in profile["series_ids"]:
+            continue
+        profiles.append(profile)
+    return profiles
+
+def required_renditions(profiles: List[Dict], available: List[str]) -> List[str]:
+    """Union of renditions any profile needs, so each is encoded only once."""
+    needed = set()
+    for profile in profiles:
+        needed.update(profile["renditions"] or available)
+    return [label for label in available if label in needed]
+
+def select_links(profile: Dict, file_links: Dict[str, str]) -> Dict[str, str]:
+    wanted = profile["renditions"]
+    return {q: lnk for q, lnk in file_links.items() if not wanted or q in wanted}
+
+def build_post(profile: Dict, title: str, file_links: Dict[str, str]) -> Tuple[str, InlineKeyboardMarkup]:
+    text = f"{profile['name_prefix']}{title}{profile['name_suffix']}"
+    if profile["meta_tags"]:
+        text += "\n" + " ".join(f"#{t}" for t in profile["meta_tags"])
+    links = list(select_links(profile, file_links).items())[:profile["max_buttons"]]
+    per_row = max(1, profile["buttons_per_row"])
+    buttons = [
+        [InlineKeyboardButton(q, url=lnk) for q, lnk in links[i:i + per_row]]
+        for i in range(0, len(links), per_row)
+    ]
+    return text, InlineKeyboardMarkup(buttons)
+
+def telegram_file_id(link: str) -> Optional[str]:
+    if link.startswith(TG_FILE_LINK_PREFIX):
+        return link[len(TG_FILE_LINK_PREFIX):]
+    return None
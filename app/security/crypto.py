@@ -1,11 +1,12 @@
-from cryptography.fernet import Fernet, InvalidToken
 from ..config import settings
 
 _fernet = None
 
-def _get_fernet() -> Fernet:
+def _get_fernet():
     global _fernet
     if _fernet is None:
+        # cryptography is only loaded the first time a credential is used
+        from cryptography.fernet import Fernet
         key = settings.ENCRYPTION_KEY.encode()
         _fernet = Fernet(key)
     return _fernet
@@ -16,6 +17,7 @@ def encrypt_str(plaintext: str) -> str:
     return token.decode("utf-8")
 
 def decrypt_str(ciphertext: str) -> str:
+    from cryptography.fernet import InvalidToken
     f = _get_fernet()
     try:
         data = f.decrypt(ciphertext.encode("utf-8"))
@@ -0,0 +1,170 @@
+import asyncio, itertools, logging, time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from pyrogram.errors import FloodWait
+
+logger = logging.getLogger("send_scheduler")
+
+# Lower value = sent first
+PRIORITY_REPLY = 0
+PRIORITY_PUBLISH = 10
+PRIORITY_UPLOAD = 20
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate  # tokens per second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until one token is available (0 if ready now)."""
+        self._refill(now)
+        wait = max(0.0, self.blocked_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def block_for(self, seconds: float):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+@dataclass(order=True)
+class _SendJob:
+    priority: int
+    seq: int
+    chat_id: Any = field(compare=False)
+    call: Callable[[], Awaitable] = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    flood_waits: int = field(default=0, compare=False)
+
+class SendScheduler:
+    """
+    Single outbound queue for Bot API calls.
+
+    Every call goes through a global token bucket and a per-chat one. Ready
+    jobs are dispatched in priority order; a job whose chat is rate limited
+    does not hold back jobs for other chats. On FloodWait the chat is paused
+    for the requested time and the job is queued again, never dropped.
+
+    File uploads (PRIORITY_UPLOAD and below) can run for minutes, so they have
+    their own in-flight limit; replies and publishes never wait behind them.
+    """
+
+    def __init__(self, global_rate: float, chat_rate: float, chat_burst: int, max_in_flight: int = 4,
+                 max_uploads_in_flight: int = 2):
+        self.global_bucket = TokenBucket(global_rate, max(1.0, global_rate))
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.limits = {"message": max_in_flight, "upload": max_uploads_in_flight}
+        self._chat_buckets: Dict[Any, TokenBucket] = {}
+        self._pending: List[_SendJob] = []
+        self._seq = itertools.count()
+        self._in_flight = {"message": 0, "upload": 0}
+        self._flood_waits = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _ensure_worker(self):
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    def _push(self, job: _SendJob):
+        self._pending.append(job)
+        self._wakeup.set()
+
+    async def submit(self, chat_id, call: Callable[[], Awaitable], priority: int = PRIORITY_PUBLISH):
+        """
+        Queue `call` (a zero-argument function returning the API coroutine, so it
+        can be re-issued after a FloodWait) and return its result.
+        """
+        self._ensure_worker()
+        job = _SendJob(priority, next(self._seq), chat_id, call, asyncio.get_running_loop().create_future())
+        self._push(job)
+        return await job.future
+
+    @staticmethod
+    def _lane(job: _SendJob) -> str:
+        return "upload" if job.priority >= PRIORITY_UPLOAD else "message"
+
+    def _pick_ready(self) -> Tuple[Optional[_SendJob], Optional[float]]:
+        now = time.monotonic()
+        open_lanes = {lane for lane, n in self._in_flight.items() if n < self.limits[lane]}
+        candidates = [j for j in self._pending if self._lane(j) in open_lanes]
+        if not candidates:
+            return None, None  # woken when a dispatch finishes
+        global_wait = self.global_bucket.wait_time(now)
+        if global_wait > 0:
+            return None, global_wait
+        best, min_wait = None, float("inf")
+        for job in candidates:
+            wait = self._chat_bucket(job.chat_id).wait_time(now)
+            if wait > 0:
+                min_wait = min(min_wait, wait)
+            elif best is None or job < best:
+                best = job
+        if best is not None:
+            self._pending.remove(best)
+            self.global_bucket.take(now)
+            self._chat_bucket(best.chat_id).take(now)
+        return best, min_wait
+
+    async def _run(self):
+        while True:
+            self._pending = [j for j in self._pending if not j.future.done()]
+            job, wait = (None, None)
+            if self._pending:
+                job, wait = self._pick_ready()
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self._in_flight[self._lane(job)] += 1
+            asyncio.create_task(self._dispatch(job))
+
+    async def _dispatch(self, job: _SendJob):
+        try:
+            result = await job.call()
+        except FloodWait as e:
+            self._flood_waits += 1
+            job.flood_waits += 1
+            logger.warning("FloodWait %ss for chat %s, requeued (attempt %s)", e.value, job.chat_id, job.flood_waits)
+            self._chat_bucket(job.chat_id).block_for(float(e.value))
+            self._pending.append(job)
+        except Exception as e:
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            self._in_flight[self._lane(job)] -= 1
+            self._wakeup.set()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": len(self._pending),
+            "in_flight": self._in_flight["message"],
+            "uploading": self._in_flight["upload"],
+            "flood_waits": self._flood_waits,
+        }
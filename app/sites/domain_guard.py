@@ -0,0 +1,128 @@
+import asyncio, logging, time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Tuple, Type
+
+logger = logging.getLogger("domain_guard")
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+class CircuitBreaker:
+    """
+    closed    -> requests flow; consecutive failures are counted
+    open      -> requests rejected until the cooldown expires
+    half_open -> one trial request; success closes, failure re-opens
+    """
+
+    def __init__(self, failure_threshold: int, cooldown_sec: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown_sec = cooldown_sec
+        self.failures = 0
+        self.opened_at = 0.0
+        self.state = "closed"
+        self.last_error = None
+
+    def allow(self) -> bool:
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown_sec:
+            self.state = "half_open"
+            return True
+        return self.state == "closed"
+
+    def record_success(self):
+        self.failures = 0
+        self.state = "closed"
+
+    def record_failure(self, error: Exception):
+        self.failures += 1
+        self.last_error = f"{type(error).__name__}: {error}"
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def abandon_trial(self):
+        """The half-open trial ended without a verdict (e.g. cancelled); let the next job try."""
+        if self.state == "half_open":
+            self.state = "open"
+
+    def retry_in(self) -> float:
+        if self.state != "open":
+            return 0.0
+        return max(0.0, self.cooldown_sec - (time.monotonic() - self.opened_at))
+
+class DomainGuard:
+    """Per-domain download concurrency limits, a global cap, and a circuit breaker per domain."""
+
+    def __init__(self, max_concurrent: int, max_per_domain: int, failure_threshold: int, cooldown_sec: float,
+                 neutral_exceptions: Tuple[Type[BaseException], ...] = ()):
+        # Errors that say nothing about the origin's health (e.g. an admin cancel)
+        self.neutral_exceptions = neutral_exceptions
+        self.max_per_domain = max_per_domain
+        self.failure_threshold = failure_threshold
+        self.cooldown_sec = cooldown_sec
+        self._global = asyncio.Semaphore(max_concurrent)
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._active: Dict[str, int] = {}
+
+    def breaker(self, domain: str) -> CircuitBreaker:
+        br = self._breakers.get(domain)
+        if br is None:
+            br = CircuitBreaker(self.failure_threshold, self.cooldown_sec)
+            self._breakers[domain] = br
+        return br
+
+    def _reject(self, domain: str):
+        br = self.breaker(domain)
+        raise CircuitOpenError(f"{domain} circuit {br.state}, retry in {int(br.retry_in())}s")
+
+    @asynccontextmanager
+    async def slot(self, domain: str):
+        """
+        Hold a download slot for `domain`. Raises CircuitOpenError without
+        waiting if the domain's breaker is open; failures inside the block
+        count towards opening it.
+        """
+        br = self.breaker(domain)
+        was_closed = br.state == "closed"
+        if not br.allow():
+            self._reject(domain)
+        is_trial = not was_closed
+        sem = self._slots.setdefault(domain, asyncio.Semaphore(self.max_per_domain))
+        try:
+            async with sem:
+                # The breaker may have opened while this job was waiting
+                if br.state == "open" or (br.state == "half_open" and not is_trial):
+                    self._reject(domain)
+                async with self._global:
+                    self._active[domain] = self._active.get(domain, 0) + 1
+                    try:
+                        yield
+                    except self.neutral_exceptions:
+                        raise
+                    except Exception as e:
+                        br.record_failure(e)
+                        if br.state == "open":
+                            logger.warning("Circuit opened for %s after %s failures: %s", domain, br.failures, br.last_error)
+                        raise
+                    else:
+                        br.record_success()
+                    finally:
+                        self._active[domain] -= 1
+        except BaseException:
+            # Cancellation or a neutral error must not leave the breaker stuck half-open
+            if is_trial:
+                br.abandon_trial()
+            raise
+
+    def status_lines(self) -> List[str]:
+        lines = []
+        for domain in sorted(set(self._breakers) | set(self._active)):
+            br = self.breaker(domain)
+            active = self._active.get(domain, 0)
+            if br.state == "closed" and not br.failures and not active:
+                continue
+            line = f"{domain}: {br.state}, active={active}, failures={br.failures}"
+            if br.state == "open":
+                line += f", retry in {int(br.retry_in())}s"
+            lines.append(line)
+        return lines
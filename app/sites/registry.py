@@ -1,18 +1,26 @@
 from typing import Dict, Optional, List
 from .base import SiteAdapter
-from .example_public_api import ExamplePublicAPIAdapter
 
 _registry: Dict[str, SiteAdapter] = {}
+_initialized = False
 
 def register_adapter(adapter: SiteAdapter):
     for d in adapter.domains:
         _registry[d.lower()] = adapter
 
 def init_registry():
+    global _initialized
+    if _initialized:
+        return
+    # Adapters pull in their HTTP clients; load them only when a lookup needs them
+    from .example_public_api import ExamplePublicAPIAdapter
     register_adapter(ExamplePublicAPIAdapter())
+    _initialized = True
 
 def find_adapter_for_domain(domain: str) -> Optional[SiteAdapter]:
+    init_registry()
     return _registry.get(domain.lower())
 
 def list_registered_adapters() -> List[str]:
+    init_registry()
     return [f"{dom} -> {_registry[dom].name}" for dom in sorted(_registry.keys())]
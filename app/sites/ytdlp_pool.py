@@ -0,0 +1,146 @@
+import asyncio, logging, multiprocessing, queue, time
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger("ytdlp_pool")
+
+_POLL_INTERVAL_SEC = 0.5
+_PROGRESS_MIN_INTERVAL_SEC = 1.0
+_PROGRESS_KEYS = ("status", "downloaded_bytes", "total_bytes", "total_bytes_estimate", "speed", "eta")
+
+class YtDlpJobError(RuntimeError):
+    pass
+
+class YtDlpTimeout(YtDlpJobError):
+    pass
+
+class YtDlpCancelled(YtDlpJobError):
+    pass
+
+def _worker_main(out_q, media_url: str, dest_path: str, username: Optional[str], password: Optional[str]):
+    """Child process entry point: runs one yt-dlp download and reports back over out_q."""
+    from .ytdlp_runner import download_with_ytdlp
+
+    last_sent = [0.0]
+    def hook(d):
+        now = time.monotonic()
+        if d.get("status") == "downloading" and now - last_sent[0] < _PROGRESS_MIN_INTERVAL_SEC:
+            return
+        last_sent[0] = now
+        out_q.put(("progress", {k: d.get(k) for k in _PROGRESS_KEYS}))
+
+    try:
+        out_q.put(("done", download_with_ytdlp(media_url, dest_path, username, password, progress_hook=hook)))
+    except Exception as e:
+        out_q.put(("error", f"{type(e).__name__}: {e}"))
+
+class YtDlpPool:
+    """
+    Runs yt-dlp downloads in separate processes, at most `max_workers` at once,
+    so extraction never competes with the bot's event loop for the GIL.
+    Each job has a timeout and can be cancelled; either kills its process.
+    Latest progress (bytes, speed, ETA) per job is kept in `progress`.
+    """
+
+    def __init__(self, max_workers: int, timeout_sec: float):
+        self.timeout_sec = timeout_sec
+        self.progress: Dict[str, Dict] = {}
+        self._slots = asyncio.Semaphore(max_workers)
+        self._ctx = multiprocessing.get_context("spawn")
+        self._procs: Dict[str, multiprocessing.Process] = {}
+        self._cancelled = set()
+
+    async def download(
+        self,
+        job_id: str,
+        media_url: str,
+        dest_path: str,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        on_progress: Optional[Callable[[str, Dict], None]] = None,
+    ) -> str:
+        if job_id in self.progress:
+            raise YtDlpJobError(f"yt-dlp job {job_id} is already queued or running")
+        self.progress[job_id] = {"status": "queued"}
+        try:
+            async with self._slots:
+                if job_id in self._cancelled:
+                    raise YtDlpCancelled(f"yt-dlp job {job_id} cancelled")
+                return await self._run_job(job_id, media_url, dest_path, username, password, on_progress)
+        finally:
+            self.progress.pop(job_id, None)
+            self._cancelled.discard(job_id)
+
+    async def _run_job(self, job_id, media_url, dest_path, username, password, on_progress) -> str:
+        out_q = self._ctx.Queue()
+        proc = self._ctx.Process(
+            target=_worker_main, args=(out_q, media_url, dest_path, username, password), daemon=True
+        )
+        proc.start()
+        self._procs[job_id] = proc
+        self.progress[job_id] = {"status": "starting"}
+        deadline = time.monotonic() + self.timeout_sec
+        try:
+            while True:
+                result = self._drain(job_id, out_q, on_progress)
+                if result is not None:
+                    kind, value = result
+                    if kind == "done":
+                        return value
+                    raise YtDlpJobError(value)
+                if not proc.is_alive():
+                    # Pick up anything flushed between the last drain and exit
+                    result = self._drain(job_id, out_q, on_progress)
+                    if result is not None and result[0] == "done":
+                        return result[1]
+                    if job_id in self._cancelled:
+                        raise YtDlpCancelled(f"yt-dlp job {job_id} cancelled")
+                    raise YtDlpJobError(
+                        result[1] if result else f"yt-dlp worker exited with code {proc.exitcode}"
+                    )
+                if time.monotonic() > deadline:
+                    raise YtDlpTimeout(f"yt-dlp job {job_id} exceeded {self.timeout_sec}s")
+                await asyncio.sleep(_POLL_INTERVAL_SEC)
+        finally:
+            if proc.is_alive():
+                proc.kill()
+            # join() blocks; keep it off the event loop
+            await asyncio.to_thread(proc.join, 1)
+            out_q.close()
+            self._procs.pop(job_id, None)
+
+    def _drain(self, job_id: str, out_q, on_progress):
+        while True:
+            try:
+                kind, value = out_q.get_nowait()
+            except queue.Empty:
+                return None
+            if kind != "progress":
+                return kind, value
+            self.progress[job_id] = value
+            if on_progress:
+                on_progress(job_id, value)
+
+    def cancel(self, job_id: str) -> bool:
+        if job_id not in self.progress:
+            return False
+        self._cancelled.add(job_id)
+        proc = self._procs.get(job_id)
+        if proc is not None:
+            proc.kill()
+        return True
+
+    def active_jobs(self) -> Dict[str, Dict]:
+        return dict(self.progress)
+
+def format_progress(p: Dict) -> str:
+    done = p.get("downloaded_bytes") or 0
+    total = p.get("total_bytes") or p.get("total_bytes_estimate")
+    speed = p.get("speed")
+    eta = p.get("eta")
+    parts = [p.get("status") or "?"]
+    parts.append(f"{done / 1e6:.1f}/{total / 1e6:.1f} MB" if total else f"{done / 1e6:.1f} MB")
+    if speed:
+        parts.append(f"{speed / 1e6:.2f} MB/s")
+    if eta is not None:
+        parts.append(f"ETA {int(eta)}s")
+    return ", ".join(parts)
@@ -1,16 +1,29 @@
 import os
-from typing import Optional
-from yt_dlp import YoutubeDL
+from typing import Callable, Optional
 
 def _base_without_ext(path: str) -> str:
     base, _ext = os.path.splitext(path)
     return base
 
+def _resolve_final_path(info: dict, final_path: str) -> str:
+    # yt-dlp records where each requested download ended up after post-processing
+    for r in reversed(info.get("requested_downloads") or []):
+        fp = r.get("filepath")
+        if fp and os.path.exists(fp):
+            return fp
+    fp = info.get("filepath")
+    if fp and os.path.exists(fp):
+        return fp
+    if os.path.exists(final_path):
+        return final_path
+    raise FileNotFoundError(f"yt-dlp finished but produced no file for {final_path}")
+
 def download_with_ytdlp(
     media_url: str,
     dest_path: str,
     username: Optional[str] = None,
     password: Optional[str] = None,
+    progress_hook: Optional[Callable[[dict], None]] = None,
 ) -> str:
     """
     Uses yt-dlp to lawfully download media_url to dest_path (mp4).
@@ -19,6 +32,9 @@ def download_with_ytdlp(
     This function is intended for sources/domains you have authorization to download from.
     Do not use on DRM-protected or ToS-restricted services.
     """
+    # Imported here: yt-dlp is by far the slowest import in the bot
+    from yt_dlp import YoutubeDL
+
     base = _base_without_ext(dest_path)
     final_path = base + ".mp4"
     ydl_opts = {
@@ -43,31 +59,9 @@ def download_with_ytdlp(
         ydl_opts["username"] = username
     if password:
         ydl_opts["password"] = password
+    if progress_hook:
+        ydl_opts["progress_hooks"] = [progress_hook]
 
     with YoutubeDL(ydl_opts) as ydl:
         info = ydl.extract_info(media_url, download=True)
-        # Try to resolve the post-processed path
-        # Newer yt-dlp sets requested_downloads[i]['filepath']
-        try:
-            reqs = info.get("requested_downloads") or []
-            for r in reqs:
-                fp = r.get("filepath")
-                if fp and os.path.exists(fp):
-                    # If not mp4, prefer final_path produced by postprocessor
-                    pass
-        except Exception:
-            pass
-
-    # Prefer the known final mp4 path
-    if os.path.exists(final_path):
-        return final_path
-
-    # Fallback: scan for any file starting with base.*
-    directory = os.path.dirname(base) or "."
-    for fname in os.listdir(directory):
-        fpath = os.path.join(directory, fname)
-        if os.path.isfile(fpath) and fname.startswith(os.path.basename(base) + "."):
-            return fpath
-
-    # Last resort: return dest_path even if not found; caller may handle error
-    return final_path
+    return _resolve_final_path(info or {}, final_path)
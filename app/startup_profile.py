@@ -0,0 +1,96 @@
+"""
+Startup timing helpers.
+
+Heavy dependencies (yt-dlp, site adapters, shorteners) are imported on first use
+through lazy_import(), and startup phases are wrapped in timed(). Both feed the
+report logged once the bot is accepting updates.
+
+For a per-module breakdown of the eager import cost run:
+    python -m app.startup_profile
+"""
+import importlib, importlib.util, logging, os, subprocess, sys, time
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger("startup")
+
+def _process_start() -> float:
+    """
+    perf_counter() value at process creation, read from /proc so the interpreter
+    start and every import before this module count. Elsewhere falls back to now.
+    """
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        age = time.clock_gettime(time.CLOCK_BOOTTIME) - start_ticks / os.sysconf("SC_CLK_TCK")
+        return time.perf_counter() - age
+    except (OSError, ValueError, IndexError, AttributeError):
+        return time.perf_counter()
+
+_PROCESS_T0 = _process_start()
+_timings: List[Tuple[str, float]] = []
+
+def record(label: str, seconds: float):
+    _timings.append((label, seconds))
+
+def since_process_start() -> float:
+    return time.perf_counter() - _PROCESS_T0
+
+@contextmanager
+def timed(label: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(label, time.perf_counter() - start)
+
+def lazy_import(name: str, package: str = None):
+    """Import a module the first time it is needed and record what it cost."""
+    full_name = importlib.util.resolve_name(name, package) if name.startswith(".") else name
+    mod = sys.modules.get(full_name)
+    if mod is not None:
+        return mod
+    with timed(f"import {full_name}"):
+        return importlib.import_module(full_name)
+
+def startup_report() -> str:
+    lines = ["Startup timings:"]
+    for label, seconds in _timings:
+        lines.append(f"  {label:<40} {seconds * 1000:8.1f} ms")
+    lines.append(f"  {'total since process start':<40} {since_process_start() * 1000:8.1f} ms")
+    return "\n".join(lines)
+
+def _importtime_entries(code: str) -> List[Tuple[str, int]]:
+    """Run `code` under -X importtime; return (module, self time in us) for every import."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True)
+    entries = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, _cumulative_us, name = line[len("import time:"):].split("|", 2)
+        entries.append((name.strip(), int(self_us)))
+    if proc.returncode != 0:
+        logger.warning("Running %r failed: %s", code, proc.stderr.strip().splitlines()[-1:])
+    return entries
+
+def import_cost_by_module(target: str = "app.bot") -> Dict[str, float]:
+    """
+    Import `target` in a fresh interpreter with -X importtime and return the
+    import cost in seconds per top-level package (pyrogram, pydantic, pymongo,
+    app, ...): the self time of every module at any depth, grouped by root.
+    Modules the bare interpreter loads at startup are left out.
+    """
+    bootstrap = {name for name, _ in _importtime_entries("pass")}
+    costs: Dict[str, float] = {}
+    for name, self_us in _importtime_entries(f"import {target}"):
+        if name in bootstrap:
+            continue
+        root = name.split(".", 1)[0]
+        costs[root] = costs.get(root, 0.0) + self_us / 1e6
+    return costs
+
+if __name__ == "__main__":
+    costs = import_cost_by_module(sys.argv[1] if len(sys.argv) > 1 else "app.bot")
+    for root, seconds in sorted(costs.items(), key=lambda kv: kv[1], reverse=True):
+        print(f"{root:<30} {seconds * 1000:8.1f} ms")
+    print(f"{'total':<30} {sum(costs.values()) * 1000:8.1f} ms")
@@ -0,0 +1,123 @@
+import asyncio, logging, time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+from .config import settings
+from .db import (
+    episode_transition_state, episode_state_breakdown, episode_reset_states,
+    job_status_breakdown, counters_find_one, counters_replace_all,
+)
+
+logger = logging.getLogger("status_counters")
+
+# Episode lifecycle; every episode is in exactly one of these
+STATES = ("pending", "downloading", "encoding", "uploading", "publishing", "processed", "failed")
+IN_FLIGHT_STATES = ("downloading", "encoding", "uploading", "publishing")
+
+_THROUGHPUT_WINDOW_SEC = 3600
+_RECONCILE_RETRY_SEC = 60
+_finished = deque()  # (timestamp, "processed" | "failed") within the last hour
+_retrying = 0        # in-flight runs of episodes that failed before (process-local)
+
+def current_state(ep: Dict) -> str:
+    return ep.get("state") or ("processed" if ep.get("processed") else "pending")
+
+def set_state(ep: Dict, new_state: str, extra: Optional[Dict] = None) -> bool:
+    """Advance `ep` (an episode document) to new_state, keeping counters in step."""
+    old_state = current_state(ep)
+    if old_state == new_state and not extra:
+        return True
+    if not episode_transition_state(ep["series_id"], ep["episode_number"], old_state, new_state, extra):
+        logger.warning("Episode %s %s was not in state %s", ep["series_id"], ep["episode_number"], old_state)
+        return False
+    ep["state"] = new_state
+    if extra:
+        ep.update(extra)
+    if new_state in ("processed", "failed"):
+        _finished.append((time.time(), new_state))
+    return True
+
+def begin_run(ep: Dict) -> bool:
+    """Mark the start of a processing run; returns whether it is a retry."""
+    global _retrying
+    retry = bool(ep.get("failures"))
+    if retry:
+        _retrying += 1
+    return retry
+
+def end_run(retry: bool):
+    global _retrying
+    if retry:
+        _retrying -= 1
+
+def _throughput() -> Dict[str, int]:
+    cutoff = time.time() - _THROUGHPUT_WINDOW_SEC
+    while _finished and _finished[0][0] < cutoff:
+        _finished.popleft()
+    out = {"processed": 0, "failed": 0}
+    for _ts, outcome in _finished:
+        out[outcome] += 1
+    return out
+
+def snapshot(series_id: Optional[str] = None) -> Dict:
+    """Current counts from the counters collection; one document read, independent of history size."""
+    doc = counters_find_one(f"series:{series_id}" if series_id is not None else "all")
+    states = {state: max(0, (doc.get("states") or {}).get(state, 0)) for state in STATES}
+    return {
+        "states": states,
+        "total": sum(states.values()),
+        "in_progress": sum(states[s] for s in IN_FLIGHT_STATES),
+        "jobs": doc.get("jobs") or {},
+        "retrying": _retrying,
+        "last_hour": _throughput(),
+    }
+
+def pending_count() -> int:
+    states = snapshot()["states"]
+    return states["pending"] + states["failed"]
+
+def format_status(series_id: Optional[str] = None) -> List[str]:
+    snap = snapshot(series_id)
+    st = snap["states"]
+    scope = f"Series {series_id}" if series_id is not None else "Episodes"
+    lines = [
+        f"{scope}: total={snap['total']}, processed={st['processed']}, pending={st['pending']}, failed={st['failed']}",
+        f"In progress={snap['in_progress']} (downloading={st['downloading']}, encoding={st['encoding']}, "
+        f"uploading={st['uploading']}, publishing={st['publishing']}), retrying={snap['retrying']}",
+        f"Last hour: processed={snap['last_hour']['processed']}, failed={snap['last_hour']['failed']}",
+    ]
+    if series_id is None and snap["jobs"]:
+        lines.append("Jobs: " + ", ".join(f"{k}={v}" for k, v in sorted(snap["jobs"].items())))
+    return lines
+
+def reconcile(reset_in_flight: bool = False):
+    """
+    Rebuild the counters from the episodes and jobs collections. With
+    reset_in_flight (at startup) episodes left mid-pipeline by a previous
+    process are returned to pending first.
+    """
+    if reset_in_flight:
+        episode_reset_states(IN_FLIGHT_STATES, "pending")
+    docs: Dict[str, Dict] = {"all": {"_id": "all", "states": {}, "jobs": {}}}
+    for row in episode_state_breakdown():
+        series_id, state, count = row["_id"]["series_id"], row["_id"]["state"], row["count"]
+        series_doc = docs.setdefault(f"series:{series_id}", {"_id": f"series:{series_id}", "states": {}})
+        for doc in (docs["all"], series_doc):
+            doc["states"][state] = doc["states"].get(state, 0) + count
+    for row in job_status_breakdown():
+        docs["all"]["jobs"][str(row["_id"])] = row["count"]
+    counters_replace_all(list(docs.values()))
+
+async def reconcile_loop(busy: Callable[[], bool]):
+    """
+    Periodically rebuild the counters. A rebuild reads the collections and then
+    replaces the counter documents, so an $inc from a run in between would be
+    lost; while busy() is true the rebuild is deferred until the pipeline is idle.
+    """
+    while True:
+        await asyncio.sleep(settings.STATUS_RECONCILE_INTERVAL_MIN * 60)
+        while busy():
+            await asyncio.sleep(_RECONCILE_RETRY_SEC)
+        try:
+            await asyncio.to_thread(reconcile)
+        except Exception as e:
+            logger.error("Counter reconciliation error: %s", e)
@@ -1,4 +1,8 @@
-import abc
+import abc, asyncio, base64, hashlib, logging, os
+from typing import Dict, Optional
+from urllib.parse import quote
+
+logger = logging.getLogger("storage")
 
 class StorageBackend(abc.ABC):
     name: str
@@ -8,28 +12,198 @@ class StorageBackend(abc.ABC):
 
 class TelegramStorage(StorageBackend):
     name = "telegram"
-    def __init__(self, bot, dump_channel_id: int):
+    def __init__(self, bot, dump_channel_id: int, sender=None):
         self.bot = bot
         self.dump_channel_id = dump_channel_id
+        self.sender = sender
+
+    async def _streamable_info(self, file_path: str) -> Optional[Dict]:
+        """send_video arguments for an MP4 with a video stream, judged by probing the file; None otherwise."""
+        from ..media.ffmpeg_wrapper import probe_media
+        try:
+            info = await probe_media(file_path)
+        except Exception as e:
+            logger.warning("Could not probe %s: %s", file_path, e)
+            return None
+        fmt = info.get("format") or {}
+        # The mov demuxer reports every ISO-BMFF file as "mov,mp4,..."; QuickTime files carry the "qt" brand
+        is_mp4 = "mp4" in (fmt.get("format_name") or "").split(",") and \
+            not (fmt.get("tags") or {}).get("major_brand", "").startswith("qt")
+        video = next((st for st in info.get("streams", []) if st.get("codec_type") == "video"), None)
+        if not is_mp4 or video is None:
+            return None
+        return {
+            "duration": int(float(fmt.get("duration") or 0)),
+            "width": video.get("width") or 0,
+            "height": video.get("height") or 0,
+        }
 
     async def store_file(self, file_path: str, desired_name: str) -> str:
-        sent = await self.bot.send_document(
-            chat_id=self.dump_channel_id,
-            document=open(file_path, "rb"),
-            file_name=desired_name
-        )
-        return f"tg://file_id/{sent.document.file_id}"
+        # MP4s go up as streamable videos so clients play them while downloading; anything else as a document
+        video_info = await self._streamable_info(file_path)
+        as_video = video_info is not None
+        # Pass the path, not an open file, so a FloodWait retry re-reads it from the start
+        def call():
+            if as_video:
+                return self.bot.send_video(
+                    chat_id=self.dump_channel_id,
+                    video=file_path,
+                    file_name=desired_name,
+                    supports_streaming=True,
+                    **video_info
+                )
+            return self.bot.send_document(
+                chat_id=self.dump_channel_id,
+                document=file_path,
+                file_name=desired_name
+            )
+        if self.sender:
+            from ..send_scheduler import PRIORITY_UPLOAD
+            sent = await self.sender.submit(self.dump_channel_id, call, priority=PRIORITY_UPLOAD)
+        else:
+            sent = await call()
+        media = sent.video if as_video else sent.document
+        return f"tg://file_id/{media.file_id}"
 
 class MegaStorage(StorageBackend):
     name = "mega"
     async def store_file(self, file_path: str, desired_name: str) -> str:
         raise NotImplementedError("Integrate official Mega API/SDK here.")
 
-def build_backends(bot, settings):
+def _md5_b64(data: bytes) -> str:
+    return base64.b64encode(hashlib.md5(data).digest()).decode("ascii")
+
+class S3Storage(StorageBackend):
+    """
+    Any S3-API-compatible object store (AWS S3, MinIO, moto, R2, ...).
+    Files larger than one part are sent as a multipart upload with parts in
+    flight concurrently. Every request carries Content-MD5, so the server
+    rejects a corrupted body; ETags are not compared, since they are not MD5s
+    under SSE-KMS/SSE-C or on some compatible stores.
+    Links are `public_base_url` + key and never expire, because they end up in
+    channel buttons and checkpoints.
+    """
+    name = "s3"
+    def __init__(self, bucket: str, public_base_url: str, endpoint_url: Optional[str] = None,
+                 access_key: Optional[str] = None, secret_key: Optional[str] = None, region: Optional[str] = None,
+                 key_prefix: str = "", part_size: int = 32 * 1024 * 1024, max_concurrency: int = 4):
+        if not bucket or not public_base_url:
+            raise ValueError("S3 storage needs S3_BUCKET and S3_PUBLIC_BASE_URL")
+        self.bucket = bucket
+        self.endpoint_url = endpoint_url
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.key_prefix = key_prefix
+        self.public_base_url = public_base_url.rstrip("/")
+        self.part_size = max(part_size, 5 * 1024 * 1024)  # S3 minimum for all but the last part
+        self.max_concurrency = max_concurrency
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            # boto3 is only needed once something is actually routed here
+            import boto3
+            self._client = boto3.client(
+                "s3",
+                endpoint_url=self.endpoint_url,
+                aws_access_key_id=self.access_key,
+                aws_secret_access_key=self.secret_key,
+                region_name=self.region,
+            )
+        return self._client
+
+    async def store_file(self, file_path: str, desired_name: str) -> str:
+        key = self.key_prefix + desired_name
+        size = os.path.getsize(file_path)
+        if size <= self.part_size:
+            await asyncio.to_thread(self._put_single, file_path, key)
+        else:
+            await self._put_multipart(file_path, key, size)
+        return self._link_for(key)
+
+    def _put_single(self, file_path: str, key: str):
+        with open(file_path, "rb") as f:
+            data = f.read()
+        self._get_client().put_object(Bucket=self.bucket, Key=key, Body=data, ContentMD5=_md5_b64(data))
+
+    def _upload_part(self, file_path: str, key: str, upload_id: str, part_number: int) -> Dict:
+        with open(file_path, "rb") as f:
+            f.seek((part_number - 1) * self.part_size)
+            data = f.read(self.part_size)
+        resp = self._get_client().upload_part(
+            Bucket=self.bucket, Key=key, UploadId=upload_id, PartNumber=part_number,
+            Body=data, ContentMD5=_md5_b64(data),
+        )
+        return {"PartNumber": part_number, "ETag": resp["ETag"]}
+
+    async def _put_multipart(self, file_path: str, key: str, size: int):
+        client = self._get_client()
+        part_count = (size + self.part_size - 1) // self.part_size
+        created = await asyncio.to_thread(client.create_multipart_upload, Bucket=self.bucket, Key=key)
+        upload_id = created["UploadId"]
+        slots = asyncio.Semaphore(self.max_concurrency)
+        uploads = []  # shielded so cancelling a part never abandons its upload mid-request
+
+        async def send(part_number: int):
+            async with slots:
+                upload = asyncio.ensure_future(
+                    asyncio.to_thread(self._upload_part, file_path, key, upload_id, part_number)
+                )
+                uploads.append(upload)
+                return await asyncio.shield(upload)
+
+        tasks = [asyncio.create_task(send(n)) for n in range(1, part_count + 1)]
+        try:
+            parts = await asyncio.gather(*tasks)
+            await asyncio.to_thread(
+                client.complete_multipart_upload,
+                Bucket=self.bucket, Key=key, UploadId=upload_id, MultipartUpload={"Parts": list(parts)},
+            )
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # Parts already being sent finish first; a part landing after the abort would be orphaned
+            await asyncio.gather(*uploads, return_exceptions=True)
+            logger.warning("Aborting multipart upload of %s", key)
+            await asyncio.to_thread(client.abort_multipart_upload, Bucket=self.bucket, Key=key, UploadId=upload_id)
+            raise
+
+    def _link_for(self, key: str) -> str:
+        return f"{self.public_base_url}/{quote(key)}"
+
+def route_backend(backends: Dict[str, StorageBackend], file_path: str, label: str, default: str, settings) -> str:
+    """
+    Pick the backend name for one rendition: an explicit STORAGE_ROUTE_BY_LABEL
+    entry wins, then files at or above EXTERNAL_LARGE_FILE_THRESHOLD_BYTES go to
+    STORAGE_LARGE_FILE_BACKEND, otherwise `default`. Unconfigured targets are ignored.
+    """
+    by_label = settings.STORAGE_ROUTE_BY_LABEL.get(label)
+    if by_label in backends:
+        return by_label
+    large = settings.STORAGE_LARGE_FILE_BACKEND
+    if large in backends and os.path.getsize(file_path) >= settings.EXTERNAL_LARGE_FILE_THRESHOLD_BYTES:
+        return large
+    return default
+
+def build_backends(bot, settings, sender=None):
     mapping = {}
     for backend_name in settings.STORAGE_BACKENDS:
         if backend_name == "telegram":
-            mapping[backend_name] = TelegramStorage(bot, settings.DUMP_CHANNEL_ID)
+            mapping[backend_name] = TelegramStorage(bot, settings.DUMP_CHANNEL_ID, sender)
         elif backend_name == "mega":
             mapping[backend_name] = MegaStorage()
+        elif backend_name == "s3":
+            mapping[backend_name] = S3Storage(
+                bucket=settings.S3_BUCKET,
+                public_base_url=settings.S3_PUBLIC_BASE_URL,
+                endpoint_url=settings.S3_ENDPOINT_URL,
+                access_key=settings.S3_ACCESS_KEY,
+                secret_key=settings.S3_SECRET_KEY,
+                region=settings.S3_REGION,
+                key_prefix=settings.S3_KEY_PREFIX,
+                part_size=settings.S3_PART_SIZE_MB * 1024 * 1024,
+                max_concurrency=settings.S3_MAX_CONCURRENCY,
+            )
     return mapping
@@ -1,4 +1,5 @@
-from app.bot import main
-
 if __name__ == "__main__":
+    # Imported here, not at module level: yt-dlp workers are spawned processes that
+    # re-import this file, and they must not load the bot, pyrogram and the handlers.
+    from app.bot import main
     main()
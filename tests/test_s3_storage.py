@@ -0,0 +1,95 @@
+import asyncio, os, time
+
+import pytest
+
+pytest.importorskip("pydantic")
+pytest.importorskip("boto3")
+moto = pytest.importorskip("moto")
+
+# app.config reads these at import time
+for name, value in {
+    "BOT_TOKEN": "0:test", "API_ID": "1", "API_HASH": "test",
+    "DUMP_CHANNEL_ID": "-1", "PUBLISH_CHANNEL_ID": "-2", "ENCRYPTION_KEY": "test",
+}.items():
+    os.environ.setdefault(name, value)
+
+from app.storage.base import S3Storage
+
+BUCKET = "ott-media"
+MB = 1024 * 1024
+
+@pytest.fixture
+def storage():
+    with moto.mock_aws():
+        s3 = S3Storage(
+            bucket=BUCKET, public_base_url="https://cdn.example.com/media/", region="us-east-1",
+            access_key="test", secret_key="test", key_prefix="ep/", part_size=5 * MB,
+        )
+        s3._get_client().create_bucket(Bucket=BUCKET)
+        yield s3
+
+def _write(tmp_path, size: int):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(os.urandom(size))
+    return path
+
+def _stored_bytes(s3: S3Storage, key: str) -> bytes:
+    return s3._get_client().get_object(Bucket=BUCKET, Key=key)["Body"].read()
+
+def test_single_put(storage, tmp_path):
+    path = _write(tmp_path, 1 * MB)
+    link = asyncio.run(storage.store_file(str(path), "S01 E01 [720p].mp4"))
+    assert link == "https://cdn.example.com/media/ep/S01%20E01%20%5B720p%5D.mp4"
+    assert _stored_bytes(storage, "ep/S01 E01 [720p].mp4") == path.read_bytes()
+
+def test_multipart_upload(storage, tmp_path):
+    path = _write(tmp_path, 12 * MB)  # three parts: 5 + 5 + 2 MB
+    asyncio.run(storage.store_file(str(path), "big.mp4"))
+    assert _stored_bytes(storage, "ep/big.mp4") == path.read_bytes()
+    assert not storage._get_client().list_multipart_uploads(Bucket=BUCKET).get("Uploads")
+
+def test_multipart_aborted_on_part_failure(storage, tmp_path, monkeypatch):
+    path = _write(tmp_path, 12 * MB)
+    real_upload_part = storage._upload_part
+
+    def flaky_upload_part(file_path, key, upload_id, part_number):
+        if part_number == 2:
+            raise ConnectionError("connection reset")
+        return real_upload_part(file_path, key, upload_id, part_number)
+
+    monkeypatch.setattr(storage, "_upload_part", flaky_upload_part)
+    with pytest.raises(ConnectionError):
+        asyncio.run(storage.store_file(str(path), "big.mp4"))
+    client = storage._get_client()
+    assert not client.list_multipart_uploads(Bucket=BUCKET).get("Uploads")
+    assert not client.list_objects_v2(Bucket=BUCKET).get("Contents")
+
+def test_requires_public_base_url():
+    with pytest.raises(ValueError):
+        S3Storage(bucket=BUCKET, public_base_url=None)
+
+def test_abort_waits_for_parts_in_flight(storage, tmp_path, monkeypatch):
+    path = _write(tmp_path, 12 * MB)
+    real_upload_part = storage._upload_part
+    client = storage._get_client()
+    real_abort = client.abort_multipart_upload
+    events = []
+
+    def upload_part(file_path, key, upload_id, part_number):
+        if part_number == 1:
+            raise ConnectionError("connection reset")
+        time.sleep(0.3)  # still uploading when part 1 fails
+        result = real_upload_part(file_path, key, upload_id, part_number)
+        events.append(f"part {part_number}")
+        return result
+
+    def abort(**kwargs):
+        events.append("abort")
+        return real_abort(**kwargs)
+
+    monkeypatch.setattr(storage, "_upload_part", upload_part)
+    monkeypatch.setattr(client, "abort_multipart_upload", abort)
+    with pytest.raises(ConnectionError):
+        asyncio.run(storage.store_file(str(path), "big.mp4"))
+    assert events[-1] == "abort" and len(events) == 3
+    assert not client.list_multipart_uploads(Bucket=BUCKET).get("Uploads")